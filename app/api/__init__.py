@@ -4,6 +4,7 @@ from app.core.config import settings
 from app.core.logger import setup_logger
 from app.api.routes import api_bp
 from app.utils.error_handlers import register_error_handlers
+from app.utils.profiling import register_profiling
 
 
 def create_app() -> Flask:
@@ -19,6 +20,9 @@ def create_app() -> Flask:
     # Регистрация обработчиков ошибок
     register_error_handlers(app)
     
+    # Учет SQL и профилирование запросов
+    register_profiling(app)
+    
     logger.info("Flask application created successfully")
     
     return app
\ No newline at end of file
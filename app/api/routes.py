@@ -1,9 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from pydantic import ValidationError
 import logging
 
-from app.models.requests import ReviewsRequest
-from app.services.observer import ReviewObserver
+from app.core.config import settings
+from app.models.requests import (
+    ReviewsRequest, ReviewsFilter, ExportRequest, SearchRequest, RecentReviewsRequest
+)
+from app.services.cache import query_cache
+from app.services.dashboard import ReviewDashboardService
+from app.services.export import ReviewExporter
+from app.services.progress import stream_progress
+from app.services.search import ReviewSearchService
+from app.services.async_observer import run_reviews_request
 
 api_bp = Blueprint('api', __name__)
 logger = logging.getLogger('review_service.api')
@@ -20,9 +28,20 @@ def get_reviews():
     
     request_data = ReviewsRequest(**request.json)
     
-    # Обработка запроса
-    observer = ReviewObserver()
-    stats = observer.process_reviews_request(request_data)
+    # Потоковый режим: события прогресса в NDJSON по мере выполнения этапов
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        logger.info("Streaming reviews processing progress as NDJSON")
+        return Response(
+            stream_with_context(stream_progress(
+                lambda on_progress: run_reviews_request(request_data, on_progress=on_progress),
+                heartbeat_interval=settings.progress_heartbeat_interval
+            )),
+            mimetype='application/x-ndjson',
+            headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+        )
+    
+    # Обработка запроса (sync или async режим по настройке PIPELINE_MODE)
+    stats = run_reviews_request(request_data)
     
     logger.info(f"Reviews request completed successfully: {stats}")
     return jsonify({
@@ -32,6 +51,68 @@ def get_reviews():
     }), 200
 
 
+@api_bp.route('/reviews/export', methods=['GET'])
+def export_reviews():
+    """Эндпоинт для потоковой выгрузки отзывов."""
+    export_request = ExportRequest(**request.args.to_dict())
+    logger.info(f"Received export request from {request.remote_addr}: {export_request}")
+    
+    exporter = ReviewExporter()
+    exporter.check_format(export_request.format)
+    
+    return Response(
+        stream_with_context(exporter.stream(export_request)),
+        mimetype=exporter.content_type(export_request),
+        headers={
+            "Content-Disposition": f"attachment; filename={exporter.filename(export_request)}"
+        }
+    )
+
+
+@api_bp.route('/reviews/search', methods=['GET'])
+def search_reviews():
+    """Эндпоинт для полнотекстового поиска по отзывам."""
+    search_request = SearchRequest(**request.args.to_dict())
+    
+    result = ReviewSearchService().search(search_request)
+    
+    return jsonify({
+        "status": "success",
+        **result
+    }), 200
+
+
+@api_bp.route('/reviews/counts', methods=['GET'])
+def review_counts():
+    """Эндпоинт для количества отзывов по приложениям и категориям."""
+    filters = ReviewsFilter(**request.args.to_dict())
+    
+    return jsonify({
+        "status": "success",
+        **ReviewDashboardService().counts(filters)
+    }), 200
+
+
+@api_bp.route('/reviews/recent', methods=['GET'])
+def recent_reviews():
+    """Эндпоинт для последних отзывов."""
+    recent_request = RecentReviewsRequest(**request.args.to_dict())
+    
+    return jsonify({
+        "status": "success",
+        **ReviewDashboardService().recent(recent_request)
+    }), 200
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Эндпоинт для статистики попаданий в кэш."""
+    return jsonify({
+        "status": "success",
+        "cache": query_cache.stats()
+    }), 200
+
+
 @api_bp.route('/health', methods=['GET'])
 def health():
     """Эндпоинт для проверки здоровья сервиса."""
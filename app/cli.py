@@ -0,0 +1,76 @@
+"""Командная строка сервиса отзывов.
+
+Примеры:
+    python -m app.cli process request.json
+    python -m app.cli process request.json --mode async
+    python -m app.cli process request.json --mode staged
+    python -m app.cli archive --older-than-days 180
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from app.core.logger import setup_logger
+from app.models.requests import ReviewsRequest
+
+
+def _process(args: argparse.Namespace) -> int:
+    """Обработать запрос на получение отзывов из JSON файла."""
+    from app.services.async_observer import AsyncReviewObserver
+    from app.services.observer import ReviewObserver
+    from app.services.pipeline import StagedReviewObserver
+    
+    with open(args.request_file, encoding="utf-8") as request_file:
+        request_data = ReviewsRequest(**json.load(request_file))
+    
+    if args.mode == "async":
+        stats = asyncio.run(AsyncReviewObserver().process_reviews_request(request_data))
+    elif args.mode == "staged":
+        stats = StagedReviewObserver().process_reviews_request(request_data)
+    else:
+        stats = ReviewObserver().process_reviews_request(request_data)
+    
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+
+def _archive(args: argparse.Namespace) -> int:
+    """Перенести тексты старых обработанных отзывов в сжатый архив или вернуть их."""
+    from app.services.archive import ReviewArchiver
+    
+    archiver = ReviewArchiver(older_than_days=args.older_than_days, batch_size=args.batch_size)
+    if args.restore:
+        stats = {"restored_reviews": archiver.restore()}
+    else:
+        stats = archiver.run()
+    
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Review service CLI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    process_parser = subparsers.add_parser("process", help="Получить и обработать отзывы")
+    process_parser.add_argument("request_file", help="JSON файл в формате запроса /get_reviews")
+    process_parser.add_argument("--mode", choices=["sync", "async", "staged"], default="async")
+    process_parser.set_defaults(handler=_process)
+    
+    archive_parser = subparsers.add_parser("archive", help="Архивировать тексты старых отзывов")
+    archive_parser.add_argument("--older-than-days", type=int, help="По умолчанию ARCHIVE_AFTER_DAYS")
+    archive_parser.add_argument("--batch-size", type=int, help="По умолчанию ARCHIVE_BATCH_SIZE")
+    archive_parser.add_argument("--restore", action="store_true", help="Вернуть тексты из архива")
+    archive_parser.set_defaults(handler=_archive)
+    
+    args = parser.parse_args(argv)
+    setup_logger('review_service')
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    sys.exit(main())
\ No newline at end of file
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, List, Optional
 from app.models.reviews import RawReviewData, LLMAnalysisResult
 
 
@@ -10,6 +10,14 @@ class BaseStoreClient(ABC):
     def get_reviews(self, package_name: str) -> List[RawReviewData]:
         """Получить отзывы для приложения."""
         pass
+    
+    def fetch_raw_reviews(self, package_name: str) -> Any:
+        """Скачать отзывы без разбора (для конвейера); по умолчанию разбор не отделяется."""
+        return self.get_reviews(package_name)
+    
+    def parse_raw_reviews(self, raw_reviews: Any) -> List[RawReviewData]:
+        """Разобрать результат fetch_raw_reviews."""
+        return raw_reviews
 
 
 class BaseLLMClient(ABC):
@@ -21,6 +29,37 @@ class BaseLLMClient(ABC):
         pass
     
     @abstractmethod
-    def analyze_reviews_batch(self, review_texts: List[str]) -> List[LLMAnalysisResult]:
-        """Анализировать отзывы батчем."""
+    def analyze_reviews_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: Optional[List[str]] = None
+    ) -> List[LLMAnalysisResult]:
+        """Анализировать отзывы батчем; по умолчанию - все типы анализа из настроек."""
+        pass
+
+
+class AsyncBaseStoreClient(ABC):
+    """Базовый класс для асинхронных клиентов магазинов приложений."""
+    
+    @abstractmethod
+    async def get_reviews(self, package_name: str) -> List[RawReviewData]:
+        """Получить отзывы для приложения."""
+        pass
+
+
+class AsyncBaseLLMClient(ABC):
+    """Базовый класс для асинхронных LLM клиентов."""
+    
+    @abstractmethod
+    async def analyze_review(self, review_text: str) -> LLMAnalysisResult:
+        """Анализировать отзыв."""
+        pass
+    
+    @abstractmethod
+    async def analyze_reviews_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: Optional[List[str]] = None
+    ) -> List[LLMAnalysisResult]:
+        """Анализировать отзывы батчем; по умолчанию - все типы анализа из настроек."""
         pass
\ No newline at end of file
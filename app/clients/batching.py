@@ -0,0 +1,60 @@
+from typing import List, Sequence
+
+
+# Для BPE токенизаторов в среднем ~4 байта UTF-8 на токен
+# (кириллица занимает 2 байта на символ, т.е. ~2 символа на токен)
+BYTES_PER_TOKEN = 4
+
+# Накладные расходы на один отзыв в JSON payload (кавычки, разделители)
+REVIEW_OVERHEAD_TOKENS = 4
+
+TRUNCATION_MARKER = " … "
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов в тексте."""
+    return len(text.encode("utf-8")) // BYTES_PER_TOKEN + 1
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Обрезать текст до лимита токенов, сохраняя начало и конец."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    
+    # Доля текста, которая помещается в лимит, с запасом на маркер
+    keep_chars = int(len(text) * (max_tokens - estimate_tokens(TRUNCATION_MARKER)) / tokens)
+    while keep_chars > 0:
+        head = text[:keep_chars * 2 // 3].rstrip()
+        tail = text[len(text) - keep_chars // 3:].lstrip() if keep_chars // 3 else ""
+        truncated = f"{head}{TRUNCATION_MARKER}{tail}"
+        if estimate_tokens(truncated) <= max_tokens:
+            return truncated
+        keep_chars = int(keep_chars * 0.9)
+    
+    return text[:max_tokens]
+
+
+def pack_batches(
+    texts: Sequence[str], 
+    token_budget: int, 
+    max_batch_size: int
+) -> List[List[str]]:
+    """Разбить тексты на батчи по бюджету токенов, сохраняя порядок."""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    
+    for text in texts:
+        tokens = estimate_tokens(text) + REVIEW_OVERHEAD_TOKENS
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    
+    return batches
\ No newline at end of file
@@ -1,20 +1,41 @@
+import asyncio
+import httpx
 import requests
-from typing import List, Dict, Any
+import time
+from typing import Callable, List, Dict, Any, Optional
 import logging
 
 from app.core.config import settings
 from app.models.reviews import LLMAnalysisResult
-from app.utils.exceptions import LLMAPIError
-from .base import BaseLLMClient
+from app.utils.exceptions import LLMAPIError, LLMPartialResultError, LLMUnavailableError
+from .base import BaseLLMClient, AsyncBaseLLMClient
+from .batching import pack_batches, truncate_text
+from .resilience import CircuitBreaker, LatencyTracker, hedged_call, hedged_call_async
 
 
-class LLMClient(BaseLLMClient):
-    """Клиент для работы с LLM API."""
+class _LLMProtocol:
+    """Общая часть синхронного и асинхронного клиентов LLM API."""
+    
+    # Состояние апстрима общее для всех экземпляров клиентов в процессе
+    _circuit_breaker: Optional[CircuitBreaker] = None
+    _latency = LatencyTracker()
     
     def __init__(self):
         self.api_url = settings.llm_api_url
         self.api_key = settings.llm_api_key
+        self.token_budget = settings.llm_batch_token_budget
+        self.review_token_cap = settings.llm_review_token_cap
+        self.max_batch_size = settings.llm_max_batch_size
+        self.timeout = settings.llm_request_timeout
+        self.on_batch_done: Optional[Callable[[int], None]] = None
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+        
+        if _LLMProtocol._circuit_breaker is None:
+            _LLMProtocol._circuit_breaker = CircuitBreaker(
+                "llm",
+                failure_threshold=settings.llm_circuit_failure_threshold,
+                reset_timeout=settings.llm_circuit_reset_timeout
+            )
     
     def _get_headers(self) -> Dict[str, str]:
         """Получить заголовки для запросов."""
@@ -23,44 +44,257 @@ class LLMClient(BaseLLMClient):
             "Content-Type": "application/json"
         }
     
+    def _prepare_batches(self, review_texts: List[str]) -> List[List[str]]:
+        """Обрезать слишком длинные тексты и разбить их на батчи по бюджету токенов."""
+        prepared_texts = [
+            truncate_text(text, self.review_token_cap) for text in review_texts
+        ]
+        truncated = sum(
+            1 for original, prepared in zip(review_texts, prepared_texts)
+            if original is not prepared
+        )
+        if truncated:
+            self.logger.info(f"Truncated {truncated} reviews to {self.review_token_cap} tokens")
+        
+        batches = pack_batches(prepared_texts, self.token_budget, self.max_batch_size)
+        self.logger.info(f"Analyzing {len(review_texts)} reviews with LLM in {len(batches)} batches")
+        return batches
+    
+    def _build_payload(self, review_texts: List[str], analysis_types: List[str]) -> Dict[str, Any]:
+        """Тело запроса на анализ: все типы анализа за один запрос."""
+        return {
+            "reviews": review_texts,
+            "analysis_types": analysis_types
+        }
+    
+    def _parse_results(
+        self, 
+        data: Dict[str, Any], 
+        expected: int, 
+        analysis_types: List[str]
+    ) -> List[LLMAnalysisResult]:
+        """Разобрать ответ LLM API."""
+        results = []
+        
+        for analysis in data.get("results", []):
+            values = {
+                analysis_type: analysis.get(analysis_type) for analysis_type in analysis_types
+            }
+            if "category" in values:
+                values["category"] = values["category"] or "other"
+            
+            result = LLMAnalysisResult(
+                review_category=values.get("category"),
+                analysis=values
+            )
+            results.append(result)
+        
+        if len(results) != expected:
+            raise ValueError(f"expected {expected} results, got {len(results)}")
+        
+        return results
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Задержка перед дублирующим запросом по перцентилю задержек."""
+        if not settings.llm_hedge_enabled:
+            return None
+        
+        delay = self._latency.percentile(settings.llm_hedge_quantile)
+        if delay is None:
+            return None
+        return max(delay, settings.llm_hedge_min_delay)
+    
+    def _notify_batch_done(self, count: int) -> None:
+        """Сообщить подписчику о завершении батча."""
+        if self.on_batch_done:
+            self.on_batch_done(count)
+    
+    def _batch_error(
+        self, 
+        batches: List[List[str]], 
+        batch_results: List[Optional[List[LLMAnalysisResult]]], 
+        error: LLMAPIError
+    ) -> LLMAPIError:
+        """Ошибка упавшего батча; результаты уже разобранных батчей не теряются."""
+        if not any(batch_results):
+            return error
+        
+        results: List[Optional[LLMAnalysisResult]] = []
+        for batch, batch_result in zip(batches, batch_results):
+            results.extend(batch_result or [None] * len(batch))
+        
+        completed = sum(1 for result in results if result is not None)
+        self.logger.warning(f"Analyzed {completed} of {len(results)} reviews before LLM API error")
+        return LLMPartialResultError(results, error)
+    
+    def _check_circuit(self) -> bool:
+        """Быстрый отказ, пока предохранитель разомкнут; True - запрос является пробой."""
+        allowed, probe = self._circuit_breaker.allow_request()
+        if not allowed:
+            raise LLMUnavailableError("LLM API is unavailable, circuit breaker is open")
+        return probe
+
+
+class LLMClient(_LLMProtocol, BaseLLMClient):
+    """Клиент для работы с LLM API."""
+    
     def analyze_review(self, review_text: str) -> LLMAnalysisResult:
         """Анализировать один отзыв."""
         results = self.analyze_reviews_batch([review_text])
         return results[0]
     
-    def analyze_reviews_batch(self, review_texts: List[str]) -> List[LLMAnalysisResult]:
-        """Анализировать отзывы батчем."""
-        self.logger.info(f"Analyzing {len(review_texts)} reviews with LLM")
+    def analyze_reviews_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: Optional[List[str]] = None
+    ) -> List[LLMAnalysisResult]:
+        """Анализировать отзывы батчами в пределах бюджета токенов."""
+        if not review_texts:
+            return []
+        
+        analysis_types = analysis_types or settings.llm_analysis_types
+        batches = self._prepare_batches(review_texts)
+        batch_results: List[Optional[List[LLMAnalysisResult]]] = [None] * len(batches)
+        for index, batch in enumerate(batches):
+            try:
+                batch_results[index] = self._analyze_batch(batch, analysis_types)
+            except LLMAPIError as e:
+                raise self._batch_error(batches, batch_results, e)
+        
+        return [result for results in batch_results for result in results]
+    
+    def _post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        """Выполнить один запрос к LLM API."""
+        started = time.monotonic()
+        response = requests.post(
+            url, json=payload, headers=headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        self._latency.record(time.monotonic() - started)
+        return data
+    
+    def _analyze_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: List[str]
+    ) -> List[LLMAnalysisResult]:
+        """Отправить один батч в LLM API."""
+        probe = self._check_circuit()
         
         url = f"{self.api_url}/analyze"
         headers = self._get_headers()
-        
-        payload = {
-            "reviews": review_texts,
-            "analysis_types": ["category"]  # В будущем можно расширить
-        }
+        payload = self._build_payload(review_texts, analysis_types)
         
         try:
-            response = requests.post(
-                url, json=payload, headers=headers, timeout=120
+            data = hedged_call(
+                lambda: self._post(url, payload, headers), self._hedge_delay()
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            results = []
-            
-            for analysis in data.get("results", []):
-                result = LLMAnalysisResult(
-                    review_category=analysis.get("category", "other")
-                )
-                results.append(result)
+            results = self._parse_results(data, len(review_texts), analysis_types)
             
+            self._circuit_breaker.record_success()
             self.logger.info(f"Successfully analyzed {len(results)} reviews")
+            self._notify_batch_done(len(results))
             return results
-            
+        
         except requests.RequestException as e:
+            self._circuit_breaker.record_failure()
             self.logger.error(f"LLM API request failed: {e}")
             raise LLMAPIError(f"Failed to analyze reviews: {e}")
         except (KeyError, ValueError) as e:
+            self._circuit_breaker.record_failure()
             self.logger.error(f"Failed to parse LLM response: {e}")
-            raise LLMAPIError(f"Invalid LLM response format: {e}")
\ No newline at end of file
+            raise LLMAPIError(f"Invalid LLM response format: {e}")
+        finally:
+            if probe:
+                self._circuit_breaker.release_probe()
+
+
+class AsyncLLMClient(_LLMProtocol, AsyncBaseLLMClient):
+    """Асинхронный клиент для работы с LLM API."""
+    
+    def __init__(self, http_client: httpx.AsyncClient, concurrency: Optional[int] = None):
+        super().__init__()
+        self.http_client = http_client
+        self.semaphore = asyncio.Semaphore(concurrency or settings.async_llm_concurrency)
+    
+    async def analyze_review(self, review_text: str) -> LLMAnalysisResult:
+        """Анализировать один отзыв."""
+        results = await self.analyze_reviews_batch([review_text])
+        return results[0]
+    
+    async def analyze_reviews_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: Optional[List[str]] = None
+    ) -> List[LLMAnalysisResult]:
+        """Анализировать отзывы батчами параллельно, сохраняя порядок результатов."""
+        if not review_texts:
+            return []
+        
+        analysis_types = analysis_types or settings.llm_analysis_types
+        batches = self._prepare_batches(review_texts)
+        # Ошибка одного батча не отменяет остальные: их результаты тоже нужно вернуть
+        batch_results = await asyncio.gather(*(
+            self._analyze_batch(batch, analysis_types) for batch in batches
+        ), return_exceptions=True)
+        
+        errors = [results for results in batch_results if isinstance(results, BaseException)]
+        if errors:
+            for error in errors:
+                if not isinstance(error, LLMAPIError):
+                    raise error
+            raise self._batch_error(
+                batches,
+                [None if isinstance(results, BaseException) else results for results in batch_results],
+                errors[0]
+            )
+        
+        return [result for results in batch_results for result in results]
+    
+    async def _post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        """Выполнить один запрос к LLM API."""
+        started = time.monotonic()
+        response = await self.http_client.post(
+            url, json=payload, headers=headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        self._latency.record(time.monotonic() - started)
+        return data
+    
+    async def _analyze_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: List[str]
+    ) -> List[LLMAnalysisResult]:
+        """Отправить один батч в LLM API."""
+        async with self.semaphore:
+            probe = self._check_circuit()
+            
+            url = f"{self.api_url}/analyze"
+            headers = self._get_headers()
+            payload = self._build_payload(review_texts, analysis_types)
+            
+            try:
+                data = await hedged_call_async(
+                    lambda: self._post(url, payload, headers), self._hedge_delay()
+                )
+                results = self._parse_results(data, len(review_texts), analysis_types)
+                
+                self._circuit_breaker.record_success()
+                self.logger.info(f"Successfully analyzed {len(results)} reviews")
+                self._notify_batch_done(len(results))
+                return results
+            
+            except httpx.HTTPError as e:
+                self._circuit_breaker.record_failure()
+                self.logger.error(f"LLM API request failed: {e}")
+                raise LLMAPIError(f"Failed to analyze reviews: {e}")
+            except (KeyError, ValueError) as e:
+                self._circuit_breaker.record_failure()
+                self.logger.error(f"Failed to parse LLM response: {e}")
+                raise LLMAPIError(f"Invalid LLM response format: {e}")
+            finally:
+                if probe:
+                    self._circuit_breaker.release_probe()
\ No newline at end of file
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+import logging
+
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """Предохранитель: после серии ошибок временно отклоняет запросы к апстриму."""
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+    
+    def allow_request(self) -> Tuple[bool, bool]:
+        """(можно ли выполнить запрос, является ли он пробой).
+        
+        В полуоткрытом состоянии пропускается одна проба; флаг пробы после нее
+        снимает release_probe.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True, False
+            
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False, False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            
+            if self._probe_in_flight:
+                return False, False
+            self._probe_in_flight = True
+            return True, True
+    
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                self.logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def release_probe(self) -> None:
+        """Снять флаг пробы; вызывается только запросом, который allow_request признал пробой.
+        
+        Иначе непредвиденное исключение или отмена пробы оставили бы предохранитель
+        полуоткрытым без единой пробы до перезапуска процесса.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.logger.warning(
+                        f"Circuit '{self.name}' opened after {self._failures} failures"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Скользящее окно задержек для оценки перцентилей."""
+    
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, quantile: float, min_samples: int = 20) -> Optional[float]:
+        """Перцентиль задержки или None, если данных пока мало."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return ordered[index]
+
+
+HEDGE_WORKERS = 32
+# Дублей, одновременно занимающих потоки пула (включая проигравшие, которые еще не завершились)
+MAX_OUTSTANDING_HEDGES = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Задача отправляется в пул, только если для нее есть свободный поток: в очереди пула
+# ничего не ждет, проигравшие запросы не задерживают новые
+_free_workers = threading.BoundedSemaphore(HEDGE_WORKERS)
+_free_hedges = threading.BoundedSemaphore(MAX_OUTSTANDING_HEDGES)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Общий пул потоков для хеджированных запросов, создается при первом использовании."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedged")
+        return _executor
+
+
+def _reset_executor_after_fork() -> None:
+    # Потоки пула не переживают fork, дочерний процесс создаст свой пул
+    global _executor, _free_workers, _free_hedges
+    _executor = None
+    _free_workers = threading.BoundedSemaphore(HEDGE_WORKERS)
+    _free_hedges = threading.BoundedSemaphore(MAX_OUTSTANDING_HEDGES)
+
+
+os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+
+def _try_submit(func: Callable[[], T], hedge: bool = False) -> Optional["Future[T]"]:
+    """Отправить func в пул, если есть свободный поток (и лимит дублей для hedge); иначе None."""
+    slots = [_free_workers, _free_hedges] if hedge else [_free_workers]
+    acquired = []
+    for slot in slots:
+        if not slot.acquire(blocking=False):
+            for taken in acquired:
+                taken.release()
+            return None
+        acquired.append(slot)
+    
+    def run() -> T:
+        try:
+            return func()
+        finally:
+            for taken in acquired:
+                taken.release()
+    
+    return _get_executor().submit(run)
+
+
+def hedged_call(func: Callable[[], T], hedge_delay: Optional[float]) -> T:
+    """Выполнить вызов; если ответа нет через hedge_delay, запустить дубль и взять первый успешный.
+    
+    Основной запрос уходит в пул, только если там есть свободный поток, иначе выполняется
+    в потоке вызывающего без хеджирования; дубль запускается, только если не исчерпан
+    MAX_OUTSTANDING_HEDGES. Проигравший запрос не прерывается (HTTP вызов нельзя отменить),
+    но держит уже учтенный поток и не задерживает новые запросы.
+    """
+    if hedge_delay is None:
+        return func()
+    
+    primary = _try_submit(func)
+    if primary is None:
+        return func()
+    
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done:
+        return primary.result()
+    
+    hedge = _try_submit(func, hedge=True)
+    if hedge is None:
+        return primary.result()
+    
+    pending = {primary, hedge}
+    first_error: Optional[BaseException] = None
+    
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future.result()
+            first_error = first_error or error
+    
+    raise first_error
+
+
+async def hedged_call_async(factory: Callable[[], Awaitable[T]], hedge_delay: Optional[float]) -> T:
+    """Асинхронный вариант hedged_call: factory создает новую корутину на каждую попытку."""
+    if hedge_delay is None:
+        return await factory()
+    
+    primary = asyncio.ensure_future(factory())
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        return primary.result()
+    
+    pending = {primary, asyncio.ensure_future(factory())}
+    first_error: Optional[BaseException] = None
+    
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    return task.result()
+                first_error = first_error or error
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    raise first_error
\ No newline at end of file
@@ -1,3 +1,5 @@
+import asyncio
+import httpx
 import requests
 from datetime import datetime
 from typing import List, Optional, Dict, Any
@@ -6,11 +8,11 @@ import logging
 from app.core.config import settings
 from app.models.reviews import RawReviewData
 from app.utils.exceptions import StoreAPIError
-from .base import BaseStoreClient
+from .base import BaseStoreClient, AsyncBaseStoreClient
 
 
-class RuStoreClient(BaseStoreClient):
-    """Клиент для работы с RuStore API."""
+class _RuStoreProtocol:
+    """Общая часть синхронного и асинхронного клиентов RuStore API."""
     
     def __init__(self):
         self.api_url = settings.rustore_api_url
@@ -18,26 +20,71 @@ class RuStoreClient(BaseStoreClient):
         self.client_secret = settings.rustore_client_secret
         self._access_token: Optional[str] = None
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
-        
-    def _authenticate(self) -> str:
-        """Получить токен аутентификации."""
-        url = f"{self.api_url}/auth/token"
-        
-        data = {
+    
+    def _auth_data(self) -> Dict[str, str]:
+        """Данные запроса токена."""
+        return {
             "client_id": self.client_id,
             "client_secret": self.client_secret,
             "grant_type": "client_credentials"
         }
+    
+    def _auth_headers(self) -> Dict[str, str]:
+        """Заголовки с текущим токеном."""
+        return {
+            "Authorization": f"Bearer {self._access_token}",
+            "Content-Type": "application/json"
+        }
+    
+    def _parse_reviews(self, data: Dict[str, Any]) -> List[RawReviewData]:
+        """Разобрать список отзывов из ответа API."""
+        reviews = []
+        
+        for review_data in data.get("reviews", []):
+            review = self._parse_review_data(review_data)
+            if review:
+                reviews.append(review)
         
+        return reviews
+    
+    def _parse_review_data(self, data: Dict[str, Any]) -> Optional[RawReviewData]:
+        """Парсинг данных отзыва из ответа API."""
         try:
-            response = requests.post(url, data=data, timeout=30)
+            return RawReviewData(
+                published_date=datetime.fromisoformat(data["published_date"]),
+                rating=data["rating"],
+                text=data["text"],
+                written_date=datetime.fromisoformat(data["written_date"]),
+                app_version=data["app_version"],
+                store_review_id=data["id"],
+                likes_count=data.get("likes_count", 0),
+                dislikes_count=data.get("dislikes_count", 0),
+                is_modified=data.get("is_modified", False),
+                device_manufacturer=data.get("device_manufacturer"),
+                device_model=data.get("device_model"),
+                device_firmware=data.get("device_firmware")
+            )
+        except (KeyError, ValueError) as e:
+            self.logger.warning(f"Failed to parse review data: {e}")
+            return None
+
+
+class RuStoreClient(_RuStoreProtocol, BaseStoreClient):
+    """Клиент для работы с RuStore API."""
+    
+    def _authenticate(self) -> str:
+        """Получить токен аутентификации."""
+        url = f"{self.api_url}/auth/token"
+        
+        try:
+            response = requests.post(url, data=self._auth_data(), timeout=30)
             response.raise_for_status()
             
             token_data = response.json()
             self._access_token = token_data["access_token"]
             self.logger.info("Successfully authenticated with RuStore API")
             return self._access_token
-            
+        
         except requests.RequestException as e:
             self.logger.error(f"Authentication failed: {e}")
             raise StoreAPIError(f"Failed to authenticate with RuStore: {e}")
@@ -46,11 +93,8 @@ class RuStoreClient(BaseStoreClient):
         """Получить заголовки для запросов."""
         if not self._access_token:
             self._authenticate()
-            
-        return {
-            "Authorization": f"Bearer {self._access_token}",
-            "Content-Type": "application/json"
-        }
+        
+        return self._auth_headers()
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Выполнить запрос к API."""
@@ -73,52 +117,117 @@ class RuStoreClient(BaseStoreClient):
             
             response.raise_for_status()
             return response.json()
-            
+        
         except requests.RequestException as e:
             self.logger.error(f"API request failed: {e}")
             raise StoreAPIError(f"RuStore API request failed: {e}")
     
     def get_reviews(self, package_name: str) -> List[RawReviewData]:
         """Получить отзывы для приложения."""
+        return self.parse_raw_reviews(self.fetch_raw_reviews(package_name))
+    
+    def fetch_raw_reviews(self, package_name: str) -> Dict[str, Any]:
+        """Скачать ответ API с отзывами приложения без разбора."""
         self.logger.info(f"Fetching reviews for package: {package_name}")
         
         endpoint = f"/api/v1/reviews/{package_name}"
         
         try:
-            data = self._make_request("GET", endpoint)
-            reviews = []
-            
-            for review_data in data.get("reviews", []):
-                review = self._parse_review_data(review_data)
-                if review:
-                    reviews.append(review)
-            
-            self.logger.info(f"Successfully fetched {len(reviews)} reviews")
-            return reviews
-            
+            return self._make_request("GET", endpoint)
+        
         except StoreAPIError:
             raise  # Перебрасываем наше исключение
         except Exception as e:
             self.logger.error(f"Unexpected error while fetching reviews: {e}")
             raise StoreAPIError(f"Unexpected error in RuStore client: {e}")
     
-    def _parse_review_data(self, data: Dict[str, Any]) -> Optional[RawReviewData]:
-        """Парсинг данных отзыва из ответа API."""
+    def parse_raw_reviews(self, raw_reviews: Dict[str, Any]) -> List[RawReviewData]:
+        """Разобрать ответ API с отзывами."""
         try:
-            return RawReviewData(
-                published_date=datetime.fromisoformat(data["published_date"]),
-                rating=data["rating"],
-                text=data["text"],
-                written_date=datetime.fromisoformat(data["written_date"]),
-                app_version=data["app_version"],
-                store_review_id=data["id"],
-                likes_count=data.get("likes_count", 0),
-                dislikes_count=data.get("dislikes_count", 0),
-                is_modified=data.get("is_modified", False),
-                device_manufacturer=data.get("device_manufacturer"),
-                device_model=data.get("device_model"),
-                device_firmware=data.get("device_firmware")
+            reviews = self._parse_reviews(raw_reviews)
+            
+            self.logger.info(f"Successfully fetched {len(reviews)} reviews")
+            return reviews
+        
+        except Exception as e:
+            self.logger.error(f"Unexpected error while parsing reviews: {e}")
+            raise StoreAPIError(f"Unexpected error in RuStore client: {e}")
+
+
+class AsyncRuStoreClient(_RuStoreProtocol, AsyncBaseStoreClient):
+    """Асинхронный клиент для работы с RuStore API."""
+    
+    def __init__(self, http_client: httpx.AsyncClient):
+        super().__init__()
+        self.http_client = http_client
+        self._auth_lock = asyncio.Lock()
+    
+    async def _authenticate(self) -> str:
+        """Получить токен аутентификации."""
+        url = f"{self.api_url}/auth/token"
+        
+        try:
+            response = await self.http_client.post(url, data=self._auth_data(), timeout=30)
+            response.raise_for_status()
+            
+            token_data = response.json()
+            self._access_token = token_data["access_token"]
+            self.logger.info("Successfully authenticated with RuStore API")
+            return self._access_token
+        
+        except httpx.HTTPError as e:
+            self.logger.error(f"Authentication failed: {e}")
+            raise StoreAPIError(f"Failed to authenticate with RuStore: {e}")
+    
+    async def _get_headers(self) -> Dict[str, str]:
+        """Получить заголовки для запросов."""
+        if not self._access_token:
+            async with self._auth_lock:
+                if not self._access_token:
+                    await self._authenticate()
+        
+        return self._auth_headers()
+    
+    async def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Выполнить запрос к API."""
+        url = f"{self.api_url}{endpoint}"
+        
+        try:
+            response = await self.http_client.request(
+                method, url, headers=await self._get_headers(), timeout=30, **kwargs
             )
-        except (KeyError, ValueError) as e:
-            self.logger.warning(f"Failed to parse review data: {e}")
-            return None
\ No newline at end of file
+            
+            # Если токен истек, попробуем обновить его
+            if response.status_code == 401:
+                self.logger.warning("Token expired, refreshing...")
+                async with self._auth_lock:
+                    await self._authenticate()
+                response = await self.http_client.request(
+                    method, url, headers=self._auth_headers(), timeout=30, **kwargs
+                )
+            
+            response.raise_for_status()
+            return response.json()
+        
+        except httpx.HTTPError as e:
+            self.logger.error(f"API request failed: {e}")
+            raise StoreAPIError(f"RuStore API request failed: {e}")
+    
+    async def get_reviews(self, package_name: str) -> List[RawReviewData]:
+        """Получить отзывы для приложения."""
+        self.logger.info(f"Fetching reviews for package: {package_name}")
+        
+        endpoint = f"/api/v1/reviews/{package_name}"
+        
+        try:
+            data = await self._make_request("GET", endpoint)
+            reviews = self._parse_reviews(data)
+            
+            self.logger.info(f"Successfully fetched {len(reviews)} reviews")
+            return reviews
+        
+        except StoreAPIError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error while fetching reviews: {e}")
+            raise StoreAPIError(f"Unexpected error in RuStore client: {e}")
\ No newline at end of file
@@ -1,11 +1,14 @@
 import os
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 from pydantic import BaseSettings, Field
 
 
 class Settings(BaseSettings):
     # Database
     database_url: str = Field(..., env="DATABASE_URL")
+    db_pool_size: int = Field(5, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, env="DB_MAX_OVERFLOW")
     
     # RuStore API
     rustore_api_url: str = Field("https://api.rustore.ru", env="RUSTORE_API_URL")
@@ -15,11 +18,93 @@ class Settings(BaseSettings):
     # LLM API
     llm_api_url: str = Field(..., env="LLM_API_URL")
     llm_api_key: str = Field(..., env="LLM_API_KEY")
+    llm_batch_token_budget: int = Field(8000, env="LLM_BATCH_TOKEN_BUDGET")
+    llm_review_token_cap: int = Field(1000, env="LLM_REVIEW_TOKEN_CAP")
+    llm_max_batch_size: int = Field(100, env="LLM_MAX_BATCH_SIZE")
+    llm_request_timeout: float = Field(120, env="LLM_REQUEST_TIMEOUT")
+    llm_hedge_enabled: bool = Field(True, env="LLM_HEDGE_ENABLED")
+    llm_hedge_quantile: float = Field(0.95, env="LLM_HEDGE_QUANTILE")
+    llm_hedge_min_delay: float = Field(1.0, env="LLM_HEDGE_MIN_DELAY")
+    llm_circuit_failure_threshold: int = Field(5, env="LLM_CIRCUIT_FAILURE_THRESHOLD")
+    llm_circuit_reset_timeout: float = Field(30, env="LLM_CIRCUIT_RESET_TIMEOUT")
+    
+    # LLM analysis types
+    llm_analysis_types: List[str] = Field(["category"], env="LLM_ANALYSIS_TYPES")
+    llm_analysis_versions: Dict[str, int] = Field({}, env="LLM_ANALYSIS_VERSIONS")
+    llm_backfill_batch_size: int = Field(1000, env="LLM_BACKFILL_BATCH_SIZE")
+    
+    # Near-duplicate grouping
+    dedup_enabled: bool = Field(True, env="DEDUP_ENABLED")
+    dedup_max_hamming_distance: int = Field(3, env="DEDUP_MAX_HAMMING_DISTANCE")
+    dedup_min_token_similarity: float = Field(0.8, env="DEDUP_MIN_TOKEN_SIMILARITY")
+    
+    # Local pre-classifier
+    preclassifier_enabled: bool = Field(True, env="PRECLASSIFIER_ENABLED")
+    preclassifier_model_path: Optional[str] = Field(None, env="PRECLASSIFIER_MODEL_PATH")
+    preclassifier_confidence_threshold: float = Field(0.95, env="PRECLASSIFIER_CONFIDENCE_THRESHOLD")
+    preclassifier_shadow_rate: float = Field(0.05, env="PRECLASSIFIER_SHADOW_RATE")
     
     # Metrics API
     metrics_api_url: Optional[str] = Field(None, env="METRICS_API_URL")
     metrics_api_key: Optional[str] = Field(None, env="METRICS_API_KEY")
     
+    # Aggregated metrics
+    metrics_mode: str = Field("per_review", env="METRICS_MODE")
+    metrics_aggregate_labels: List[str] = Field(
+        ["store", "app_type", "category", "app_version"], env="METRICS_AGGREGATE_LABELS"
+    )
+    metrics_aggregate_window: int = Field(3600, env="METRICS_AGGREGATE_WINDOW")
+    metrics_app_version_depth: int = Field(2, env="METRICS_APP_VERSION_DEPTH")
+    
+    # Pipeline
+    pipeline_mode: str = Field("sync", env="PIPELINE_MODE")
+    async_store_concurrency: int = Field(16, env="ASYNC_STORE_CONCURRENCY")
+    async_llm_concurrency: int = Field(8, env="ASYNC_LLM_CONCURRENCY")
+    async_metrics_concurrency: int = Field(64, env="ASYNC_METRICS_CONCURRENCY")
+    async_max_connections: int = Field(200, env="ASYNC_MAX_CONNECTIONS")
+    
+    # Staged pipeline
+    pipeline_fetch_workers: int = Field(4, env="PIPELINE_FETCH_WORKERS")
+    pipeline_parse_workers: int = Field(1, env="PIPELINE_PARSE_WORKERS")
+    pipeline_persist_workers: int = Field(2, env="PIPELINE_PERSIST_WORKERS")
+    pipeline_classify_workers: int = Field(2, env="PIPELINE_CLASSIFY_WORKERS")
+    pipeline_emit_workers: int = Field(2, env="PIPELINE_EMIT_WORKERS")
+    pipeline_queue_size: int = Field(8, env="PIPELINE_QUEUE_SIZE")
+    pipeline_report_interval: float = Field(5, env="PIPELINE_REPORT_INTERVAL")
+    
+    # Progress streaming
+    progress_heartbeat_interval: float = Field(15, env="PROGRESS_HEARTBEAT_INTERVAL")
+    
+    # Coalescing
+    coalescing_enabled: bool = Field(True, env="COALESCING_ENABLED")
+    coalescing_advisory_locks: bool = Field(True, env="COALESCING_ADVISORY_LOCKS")
+    coalescing_lock_timeout: float = Field(60, env="COALESCING_LOCK_TIMEOUT")
+    
+    # Profiling
+    profiling_enabled: bool = Field(False, env="PROFILING_ENABLED")
+    profiling_header: str = Field("X-Profile", env="PROFILING_HEADER")
+    profiling_token: Optional[str] = Field(None, env="PROFILING_TOKEN")
+    profiling_sample_rate: float = Field(0.0, env="PROFILING_SAMPLE_RATE")
+    profiling_output_dir: str = Field("profiles", env="PROFILING_OUTPUT_DIR")
+    sql_repeated_statement_threshold: int = Field(20, env="SQL_REPEATED_STATEMENT_THRESHOLD")
+    
+    # Archive
+    archive_after_days: int = Field(180, env="ARCHIVE_AFTER_DAYS")
+    archive_batch_size: int = Field(1000, env="ARCHIVE_BATCH_SIZE")
+    archive_compression_level: int = Field(6, env="ARCHIVE_COMPRESSION_LEVEL")
+    
+    # Query cache
+    cache_enabled: bool = Field(True, env="CACHE_ENABLED")
+    cache_ttl: float = Field(60, env="CACHE_TTL")
+    cache_max_entries: int = Field(1024, env="CACHE_MAX_ENTRIES")
+    cache_shared_backend: Optional[str] = Field(None, env="CACHE_SHARED_BACKEND")
+    cache_shared_url: str = Field("redis://localhost:6379/0", env="CACHE_SHARED_URL")
+    cache_shared_timeout: float = Field(0.5, env="CACHE_SHARED_TIMEOUT")
+    cache_key_prefix: str = Field("review-service:cache:", env="CACHE_KEY_PREFIX")
+    
+    # Export
+    export_batch_size: int = Field(5000, env="EXPORT_BATCH_SIZE")
+    
     # Flask
     flask_env: str = Field("production", env="FLASK_ENV")
     
@@ -28,4 +113,17 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache()
+def get_settings() -> Settings:
+    """Получить настройки; .env читается при первом обращении."""
+    return Settings()
+
+
+class _LazySettings:
+    """Прокси к настройкам, откладывающий создание Settings() до первого обращения к атрибуту."""
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+
+settings = _LazySettings()
\ No newline at end of file
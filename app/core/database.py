@@ -1,21 +1,92 @@
+import os
+import threading
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from contextlib import contextmanager
-from typing import Generator
+from contextvars import ContextVar
+from typing import Generator, Optional
 
 from .config import settings
 
-engine = create_engine(settings.database_url, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Engine и фабрика сессий создаются при первом обращении, а не при импорте,
+# чтобы предзагруженный мастер-процесс не делил соединения с воркерами
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_lock = threading.Lock()
+
+# Соединение, закрепленное за текущим контекстом (например, держащее advisory lock):
+# сессии внутри него работают на нем, а не берут из пула второе
+_pinned_connection: ContextVar[Optional[Connection]] = ContextVar("pinned_connection", default=None)
+
+
+def get_engine() -> Engine:
+    """Получить engine БД, создав его при первом использовании."""
+    global _engine, _session_factory
+    
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_engine(
+                    settings.database_url,
+                    echo=False,
+                    pool_size=settings.db_pool_size,
+                    max_overflow=settings.db_max_overflow,
+                    pool_pre_ping=True
+                )
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    
+    return _engine
+
+
+def get_session_factory() -> sessionmaker:
+    """Получить фабрику сессий."""
+    get_engine()
+    return _session_factory
+
+
+def dispose_engine(close: bool = True) -> None:
+    """Сбросить пул соединений.
+    
+    В дочернем процессе после fork вызывается с close=False: соединения
+    родителя не закрываются, а просто забываются, и воркер открывает свои.
+    """
+    if _engine is not None:
+        _engine.dispose(close=close)
+
+
+def _after_fork_in_child() -> None:
+    dispose_engine(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+@contextmanager
+def pinned_connection(connection: Connection) -> Generator[None, None, None]:
+    """Выполнять сессии get_db_session внутри блока на заданном соединении.
+    
+    Соединение не должно быть в транзакции: тогда коммит сессии фиксирует работу сразу.
+    """
+    token = _pinned_connection.set(connection)
+    try:
+        yield
+    finally:
+        _pinned_connection.reset(token)
+
 
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """Контекстный менеджер для работы с БД."""
-    session = SessionLocal()
+    connection = _pinned_connection.get()
+    if connection is not None:
+        session = get_session_factory()(bind=connection)
+    else:
+        session = get_session_factory()()
     try:
         yield session
         session.commit()
@@ -28,4 +99,4 @@ def get_db_session() -> Generator[Session, None, None]:
 
 def get_db() -> Session:
     """Получение сессии БД для dependency injection."""
-    return SessionLocal()
\ No newline at end of file
+    return get_session_factory()()
\ No newline at end of file
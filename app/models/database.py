@@ -1,7 +1,10 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column, ForeignKey, LargeBinary, String, Integer, Text, DateTime, Boolean, false,
+    text as sql_text
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
 
 from app.core.database import Base
 
@@ -23,6 +26,27 @@ class Review(Base):
     device_firmware = Column(String(100), nullable=True)
     is_processed = Column(Boolean, default=False)
     review_category = Column(String(50), nullable=True)
+    # {тип анализа: {"value": ..., "version": ...}}
+    analysis = Column(JSONB, nullable=False, default=dict, server_default=sql_text("'{}'::jsonb"))
     store_review_id = Column(String(100), nullable=False, unique=True)
+    # Текст архивного отзыва хранится сжатым в review_archive, а здесь пуст
+    is_archived = Column(Boolean, nullable=False, default=False, server_default=false())
+    content_hash = Column(String(32), nullable=True)
+    # to_tsvector('russian', text), заполняется триггером (миграция 006) и
+    # сохраняется у архивных отзывов, чтобы они оставались в поиске
+    text_search = Column(TSVECTOR)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReviewArchive(Base):
+    __tablename__ = "review_archive"
+    
+    review_id = Column(
+        UUID(as_uuid=True), 
+        ForeignKey("reviews.id", ondelete="CASCADE"), 
+        primary_key=True
+    )
+    text_compressed = Column(LargeBinary, nullable=False)
+    compression = Column(String(16), nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
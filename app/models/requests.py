@@ -1,5 +1,6 @@
-from typing import List
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
 
 class AppInfo(BaseModel):
@@ -13,4 +14,33 @@ class StoreInfo(BaseModel):
 
 
 class ReviewsRequest(BaseModel):
-    stores: List[StoreInfo]
\ No newline at end of file
+    stores: List[StoreInfo]
+
+
+class ReviewsFilter(BaseModel):
+    """Фильтры выборки отзывов из БД."""
+    store: Optional[str] = None
+    app_type: Optional[str] = None
+    category: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+class ExportRequest(ReviewsFilter):
+    """Параметры выгрузки отзывов."""
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson"
+    gzip: bool = False
+
+
+class SearchRequest(ReviewsFilter):
+    """Параметры полнотекстового поиска по отзывам."""
+    q: str = Field(..., min_length=1, max_length=500)
+    mode: Literal["websearch", "phrase", "plain"] = "websearch"
+    highlight: bool = True
+    limit: int = Field(20, ge=1, le=100)
+    offset: int = Field(0, ge=0, le=10000)
+
+
+class RecentReviewsRequest(ReviewsFilter):
+    """Параметры выборки последних отзывов."""
+    limit: int = Field(50, ge=1, le=200)
\ No newline at end of file
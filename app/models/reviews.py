@@ -1,5 +1,6 @@
+import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, NamedTuple, Optional
 from pydantic import BaseModel
 
 
@@ -21,22 +22,28 @@ class RawReviewData(BaseModel):
 
 class LLMAnalysisResult(BaseModel):
     """Результат анализа отзыва через LLM."""
-    review_category: str  # bug/other
+    review_category: Optional[str] = None  # bug/other, если категория запрашивалась
+    analysis: Dict[str, Any] = {}  # Значения по типам анализа
+    source: str = "llm"  # llm или preclassifier - кто поставил метки
 
 
-class ProcessedReview(BaseModel):
-    """Обработанный отзыв с результатами анализа."""
-    id: str
+class PendingReview(NamedTuple):
+    """Необработанный отзыв: только поля, нужные для классификации."""
+    id: uuid.UUID
+    text: str
+    score: int
+    content_hash: str
+    analysis: Dict[str, Any]
+
+
+class MetricReview(NamedTuple):
+    """Обработанный отзыв: только поля, нужные для метрик."""
+    id: uuid.UUID
     app_type: str
     store: str
-    score: int
-    text: str
     date: datetime
     app_version: str
-    likes_count: int
-    dislikes_count: int
-    device_manufacturer: Optional[str] = None
-    device_model: Optional[str] = None
-    device_firmware: Optional[str] = None
-    is_processed: bool = False
-    review_category: Optional[str] = None
\ No newline at end of file
+    review_category: Optional[str]
+    device_manufacturer: Optional[str]
+    device_model: Optional[str]
+    device_firmware: Optional[str]
\ No newline at end of file
@@ -0,0 +1,201 @@
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+from sqlalchemy import Text, any_, bindparam, delete, literal, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.models.database import Review, ReviewArchive
+
+
+COMPRESSION = "zlib"
+
+_REVIEW_IDS_TYPE = ARRAY(UUID(as_uuid=True))
+
+# updated_at не меняем: возврат текста не должен повторно отправлять метрики
+_RESTORE_STATEMENT = text("""
+    UPDATE reviews
+    SET text = v.text, is_archived = false
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:texts AS text[])) AS v(id, text)
+    WHERE reviews.id = v.id
+""").bindparams(
+    bindparam("ids", type_=_REVIEW_IDS_TYPE),
+    bindparam("texts", type_=ARRAY(Text))
+)
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), settings.archive_compression_level)
+
+
+def decompress_text(data: bytes, compression: str) -> str:
+    if compression != COMPRESSION:
+        raise ValueError(f"Unsupported archive compression: {compression}")
+    return zlib.decompress(data).decode("utf-8")
+
+
+def load_archived_texts(session: Session, review_ids: Sequence[uuid.UUID]) -> Dict[uuid.UUID, str]:
+    """Восстановить тексты архивных отзывов одним запросом."""
+    if not review_ids:
+        return {}
+    
+    rows = session.execute(
+        select(
+            ReviewArchive.review_id, ReviewArchive.text_compressed, ReviewArchive.compression
+        ).where(ReviewArchive.review_id == any_(literal(list(review_ids), _REVIEW_IDS_TYPE)))
+    )
+    return {
+        review_id: decompress_text(bytes(data), compression)
+        for review_id, data, compression in rows
+    }
+
+
+class ReviewArchiver:
+    """Перенос текстов старых обработанных отзывов в сжатый архив.
+    
+    В reviews остаются метаданные и результаты анализа, а text очищается и
+    is_archived = true; сжатый текст хранится в review_archive. Чтение через API
+    восстанавливает текст прозрачно (load_archived_texts).
+    """
+    
+    def __init__(self, older_than_days: Optional[int] = None, batch_size: Optional[int] = None):
+        self.older_than_days = older_than_days or settings.archive_after_days
+        self.batch_size = batch_size or settings.archive_batch_size
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    def run(self) -> Dict[str, int]:
+        """Архивировать все подходящие отзывы пачками; вернуть статистику."""
+        cutoff = datetime.utcnow() - timedelta(days=self.older_than_days)
+        stats = {"archived_reviews": 0, "text_bytes": 0, "compressed_bytes": 0}
+        
+        self.logger.info(f"Archiving processed reviews older than {cutoff:%Y-%m-%d}")
+        
+        while True:
+            archived, text_bytes, compressed_bytes = self._archive_batch(cutoff)
+            if not archived:
+                break
+            
+            stats["archived_reviews"] += archived
+            stats["text_bytes"] += text_bytes
+            stats["compressed_bytes"] += compressed_bytes
+            self.logger.info(f"Archived {stats['archived_reviews']} reviews so far")
+        
+        stats["removed_stale_archives"] = self._remove_stale_archives()
+        self.logger.info(f"Archiving completed: {stats}")
+        return stats
+    
+    def _archive_batch(self, cutoff: datetime) -> Tuple[int, int, int]:
+        """Архивировать одну пачку: (отзывов, байт текста, байт после сжатия)."""
+        with get_db_session() as session:
+            # SKIP LOCKED: не ждем строки, которые сейчас пишет upsert или классификация
+            rows: List[Tuple[uuid.UUID, str]] = session.execute(
+                select(Review.id, Review.text)
+                .where(
+                    Review.is_processed == True,
+                    Review.is_archived == False,
+                    Review.date < cutoff
+                )
+                .order_by(Review.date)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            
+            if not rows:
+                return 0, 0, 0
+            
+            archived_at = datetime.utcnow()
+            archive_rows = [
+                {
+                    "review_id": review_id,
+                    "text_compressed": compress_text(text),
+                    "compression": COMPRESSION,
+                    "archived_at": archived_at
+                }
+                for review_id, text in rows
+            ]
+            
+            statement = insert(ReviewArchive).values(archive_rows)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[ReviewArchive.review_id],
+                set_={
+                    "text_compressed": statement.excluded.text_compressed,
+                    "compression": statement.excluded.compression,
+                    "archived_at": statement.excluded.archived_at
+                }
+            ))
+            
+            # updated_at не меняем: архивирование не должно повторно отправлять метрики
+            session.execute(
+                update(Review)
+                .where(Review.id == any_(literal([row[0] for row in rows], _REVIEW_IDS_TYPE)))
+                .values(text="", is_archived=True, updated_at=Review.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+        
+        text_bytes = sum(len(text.encode("utf-8")) for _, text in rows)
+        compressed_bytes = sum(len(row["text_compressed"]) for row in archive_rows)
+        return len(rows), text_bytes, compressed_bytes
+    
+    def restore(self) -> int:
+        """Вернуть все архивные тексты в reviews (например, перед откатом миграции)."""
+        restored = 0
+        
+        while True:
+            with get_db_session() as session:
+                review_ids = session.execute(
+                    select(Review.id)
+                    .where(Review.is_archived == True)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                ).scalars().all()
+                
+                if not review_ids:
+                    break
+                
+                texts = load_archived_texts(session, review_ids)
+                session.execute(_RESTORE_STATEMENT, {
+                    "ids": list(texts),
+                    "texts": list(texts.values())
+                })
+                session.execute(
+                    delete(ReviewArchive)
+                    .where(ReviewArchive.review_id == any_(literal(list(texts), _REVIEW_IDS_TYPE)))
+                    .execution_options(synchronize_session=False)
+                )
+                restored += len(texts)
+                
+                # Без записи в архиве текст не восстановить; флаг снимаем, иначе цикл
+                # выбирал бы эти отзывы бесконечно
+                missing = [review_id for review_id in review_ids if review_id not in texts]
+                if missing:
+                    self.logger.error(
+                        f"{len(missing)} archived reviews have no review_archive row, "
+                        f"their text is lost: {missing[:10]}"
+                    )
+                    session.execute(
+                        update(Review)
+                        .where(Review.id == any_(literal(missing, _REVIEW_IDS_TYPE)))
+                        .values(is_archived=False, updated_at=Review.updated_at)
+                        .execution_options(synchronize_session=False)
+                    )
+            
+            self.logger.info(f"Restored {restored} archived reviews so far")
+        
+        return restored
+    
+    def _remove_stale_archives(self) -> int:
+        """Удалить архивы отзывов, которые вернулись в горячую таблицу после правки в сторе."""
+        with get_db_session() as session:
+            return session.execute(
+                delete(ReviewArchive)
+                .where(
+                    ReviewArchive.review_id == Review.id,
+                    Review.is_archived == False
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
\ No newline at end of file
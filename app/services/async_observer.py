@@ -0,0 +1,256 @@
+import asyncio
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import logging
+
+import httpx
+
+from app.core.config import settings
+from app.models.requests import AppInfo, ReviewsRequest
+from app.models.reviews import LLMAnalysisResult, MetricReview
+from app.clients.base import AsyncBaseLLMClient, AsyncBaseStoreClient, BaseLLMClient
+from app.clients.llm import AsyncLLMClient
+from app.clients.rustore import AsyncRuStoreClient
+from app.services.metrics import AsyncMetricsService, metrics_aggregator
+from app.services.observer import ReviewObserver
+from app.services.pipeline import StagedReviewObserver
+from app.services.singleflight import singleflight
+from app.utils.exceptions import (
+    ReviewServiceError, DatabaseError, StoreAPIError, LLMAPIError
+)
+
+
+class _BlockingLLMBridge(BaseLLMClient):
+    """Синхронный фасад над асинхронным LLM клиентом для вызова из рабочего потока."""
+    
+    def __init__(self, client: AsyncBaseLLMClient, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.loop = loop
+    
+    def analyze_review(self, review_text: str) -> LLMAnalysisResult:
+        return asyncio.run_coroutine_threadsafe(
+            self.client.analyze_review(review_text), self.loop
+        ).result()
+    
+    def analyze_reviews_batch(
+        self, 
+        review_texts: List[str], 
+        analysis_types: Optional[List[str]] = None
+    ) -> List[LLMAnalysisResult]:
+        return asyncio.run_coroutine_threadsafe(
+            self.client.analyze_reviews_batch(review_texts, analysis_types), self.loop
+        ).result()
+
+
+class AsyncReviewObserver(ReviewObserver):
+    """Асинхронный вариант сервиса обработки отзывов.
+    
+    HTTP запросы к сторам, LLM и метрикам выполняются в одном event loop
+    с ограничением параллелизма семафорами; работа с БД идет в пуле потоков.
+    """
+    
+    def __init__(self, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        super().__init__(on_progress=on_progress)
+        self.async_store_clients: Dict[str, Type[AsyncBaseStoreClient]] = {
+            "rustore": AsyncRuStoreClient
+        }
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    async def process_reviews_request(self, request: ReviewsRequest) -> Dict[str, int]:
+        """Обработать запрос на получение отзывов."""
+        self.logger.info("Starting async reviews processing")
+        
+        stats = {"new_reviews": 0, "processed_reviews": 0, "errors": 0}
+        self.run_stats = Counter()
+        
+        limits = httpx.Limits(max_connections=settings.async_max_connections)
+        
+        try:
+            async with httpx.AsyncClient(limits=limits) as http_client:
+                # 1. Получить и сохранить новые отзывы
+                stats["new_reviews"] = await self._fetch_and_save_reviews_async(
+                    request, http_client
+                )
+                
+                # 2. Обработать необработанные отзывы через LLM
+                async_llm_client = AsyncLLMClient(http_client)
+                self._attach_llm_progress(async_llm_client)
+                self.llm_client = _BlockingLLMBridge(
+                    async_llm_client, asyncio.get_running_loop()
+                )
+                stats["processed_reviews"] = await asyncio.to_thread(
+                    self._process_unprocessed_reviews
+                )
+                self._emit("reviews_processed", processed_reviews=stats["processed_reviews"])
+                
+                # 3. Отправить метрики
+                metrics_service = AsyncMetricsService(http_client)
+                await singleflight.do_async(
+                    "stage:send_metrics",
+                    lambda: self._send_metrics_async(metrics_service),
+                    remote_result=None,
+                    fresh=True
+                )
+            
+            stats.update(self.run_stats)
+            self.logger.info(f"Async processing completed: {stats}")
+            return stats
+        
+        except (StoreAPIError, LLMAPIError, DatabaseError) as e:
+            self.logger.error(f"Service error during processing: {e}")
+            stats["errors"] = 1
+            raise ReviewServiceError(f"Failed to process reviews: {e}")
+        except ReviewServiceError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error during processing: {e}")
+            stats["errors"] = 1
+            raise ReviewServiceError(f"Unexpected error during processing: {e}")
+    
+    async def _fetch_and_save_reviews_async(
+        self,
+        request: ReviewsRequest,
+        http_client: httpx.AsyncClient
+    ) -> int:
+        """Параллельно получить отзывы из сторов и сохранить в БД."""
+        semaphore = asyncio.Semaphore(settings.async_store_concurrency)
+        tasks = []
+        errors = 0
+        
+        for store_info in request.stores:
+            store_type = store_info.type.lower()
+            
+            if store_type not in self.async_store_clients:
+                self.logger.warning(f"Unsupported store type: {store_type}")
+                errors += 1
+                continue
+            
+            client = self.async_store_clients[store_type](http_client)
+            
+            for app in store_info.apps:
+                tasks.append(self._fetch_app_reviews_coalesced(
+                    semaphore, client, app, store_type, store_info.type
+                ))
+        
+        results = await asyncio.gather(*tasks)
+        total_new = sum(result for result in results if result is not None)
+        errors += sum(1 for result in results if result is None)
+        
+        if errors > 0 and total_new == 0:
+            raise ReviewServiceError(f"Failed to fetch any reviews, {errors} errors occurred")
+        
+        return total_new
+    
+    async def _fetch_app_reviews_coalesced(
+        self,
+        semaphore: asyncio.Semaphore,
+        client: AsyncBaseStoreClient,
+        app: AppInfo,
+        store_type: str,
+        store: str
+    ) -> Optional[int]:
+        """Получить и сохранить отзывы одного приложения; None при ошибке."""
+        try:
+            # Одинаковая загрузка, уже идущая в другом запросе или реплике, не повторяется.
+            # Семафор охватывает и advisory lock: соединения пула занимают только
+            # выполняющиеся загрузки, а не все приложения запроса сразу
+            async with semaphore:
+                fetched, new_count, updated_count = await singleflight.do_async(
+                    f"fetch:{store_type}:{app.package_name}",
+                    lambda: self._fetch_app_reviews_async(client, app, store),
+                    remote_result=(0, 0, 0)
+                )
+            self._emit_app_fetched(store, app, fetched, new_count, updated_count)
+            return new_count
+        
+        except StoreAPIError as e:
+            self.logger.error(f"Store API error for {app.package_name}: {e}")
+            self._emit_app_failed(store, app, e)
+            return None
+        except Exception as e:
+            self.logger.error(f"Unexpected error fetching reviews for {app.package_name}: {e}")
+            self._emit_app_failed(store, app, e)
+            return None
+    
+    async def _fetch_app_reviews_async(
+        self,
+        client: AsyncBaseStoreClient,
+        app: AppInfo,
+        store: str
+    ) -> Tuple[int, int, int]:
+        """Получить и сохранить отзывы одного приложения: (получено, новых, измененных)."""
+        raw_reviews = await client.get_reviews(app.package_name)
+        
+        new_count, updated_count = await asyncio.to_thread(
+            self._save_reviews_to_db, raw_reviews, app.app_type, store
+        )
+        return len(raw_reviews), new_count, updated_count
+    
+    async def _send_metrics_async(self, metrics_service: AsyncMetricsService) -> None:
+        """Параллельно отправить метрики для обработанных отзывов."""
+        if settings.metrics_mode == "aggregated":
+            await self._send_aggregated_metrics_async(metrics_service)
+            return
+        
+        try:
+            recent_processed = await asyncio.to_thread(self._load_recent_processed_reviews)
+            
+            if not recent_processed:
+                return
+            
+            self.logger.info(f"Sending metrics for {len(recent_processed)} processed reviews")
+            
+            sent = await asyncio.gather(*(
+                self._send_review_metric(metrics_service, review) for review in recent_processed
+            ))
+            self._emit(
+                "metrics_flushed", 
+                sent_metrics=sum(sent), 
+                failed_metrics=len(recent_processed) - sum(sent)
+            )
+        
+        except Exception as e:
+            # Не прерываем процесс из-за ошибок метрик
+            self.logger.error(f"Error while sending metrics: {e}")
+    
+    async def _send_aggregated_metrics_async(self, metrics_service: AsyncMetricsService) -> None:
+        """Отправить приросты счетчиков, накопленные при классификации."""
+        try:
+            sent, failed, sent_reviews = await metrics_service.send_aggregated_metrics(
+                metrics_aggregator
+            )
+            self._emit(
+                "metrics_flushed", 
+                sent_metrics=sent, 
+                failed_metrics=failed, 
+                aggregated_reviews=sent_reviews
+            )
+        
+        except Exception as e:
+            # Не прерываем процесс из-за ошибок метрик
+            self.logger.error(f"Error while sending aggregated metrics: {e}")
+    
+    async def _send_review_metric(
+        self,
+        metrics_service: AsyncMetricsService,
+        review: MetricReview
+    ) -> bool:
+        try:
+            await metrics_service.send_review_metric(review)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error sending metrics for review {review.id}: {e}")
+            return False
+
+
+def run_reviews_request(
+    request: ReviewsRequest, 
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, int]:
+    """Обработать запрос в режиме, выбранном в настройках (из синхронного кода)."""
+    if settings.pipeline_mode == "async":
+        observer = AsyncReviewObserver(on_progress=on_progress)
+        return asyncio.run(observer.process_reviews_request(request))
+    if settings.pipeline_mode == "staged":
+        return StagedReviewObserver(on_progress=on_progress).process_reviews_request(request)
+    return ReviewObserver(on_progress=on_progress).process_reviews_request(request)
\ No newline at end of file
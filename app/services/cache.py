@@ -0,0 +1,360 @@
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+import logging
+
+from app.core.config import settings
+
+try:
+    import redis
+except ImportError:  # redis - опциональная зависимость общего уровня кэша
+    redis = None
+
+
+T = TypeVar("T")
+
+# (store, app_type); None - запрос без фильтра по этому полю
+CacheScope = Tuple[Optional[str], Optional[str]]
+
+_ANY = "*"
+_EPOCH = "epoch"
+
+
+class LRUCache:
+    """Внутрипроцессный кэш с TTL и вытеснением давно не читавшихся записей."""
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(найдено ли, значение); просроченная запись удаляется."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            
+            self._entries.move_to_end(key)
+            return True, value
+    
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedCacheTier(ABC):
+    """Общий для реплик уровень кэша: значения в байтах и счетчики поколений."""
+    
+    name: str
+    
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Значения по ключам; None для отсутствующих."""
+        pass
+    
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+    
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Атомарно увеличить счетчик (без TTL) и вернуть новое значение."""
+        pass
+
+
+class LocalSharedTier(SharedCacheTier):
+    """Заменитель общего уровня в памяти процесса: для разработки и тестов без Redis."""
+    
+    name = "local"
+    
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+    
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                expires_at, value = self._values.get(key, (None, None))
+                if expires_at is not None and expires_at <= now:
+                    del self._values[key]
+                    value = None
+                values.append(value)
+            return values
+    
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl, value)
+    
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._values.get(key, (None, b"0"))
+            counter = int(value) + 1
+            self._values[key] = (None, str(counter).encode())
+            return counter
+
+
+class RedisSharedTier(SharedCacheTier):
+    """Общий уровень кэша в Redis."""
+    
+    name = "redis"
+    
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=settings.cache_shared_timeout
+        )
+    
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return self._client.mget(keys)
+    
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.set(key, value, px=int(ttl * 1000))
+    
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+
+class QueryCache:
+    """Read-through кэш ответов эндпоинтов чтения с инвалидацией по поколениям.
+    
+    Каждая запись зависит от области (store, app_type) запроса. Запись в БД по
+    паре (store, app_type) увеличивает поколения этой пары и всех областей, которые
+    ее покрывают: (store, *), (*, app_type) и (*, *). Поколение входит в ключ,
+    поэтому устаревшие записи просто перестают читаться и вытесняются по LRU/TTL.
+    
+    Без общего уровня поколения живут в памяти процесса, и запись, сделанная другим
+    процессом (воркер gunicorn, CLI), становится видна только по истечении TTL.
+    """
+    
+    def __init__(self):
+        self._local: Optional[LRUCache] = None
+        self._shared: Optional[SharedCacheTier] = None
+        self._shared_initialized = False
+        self._generations: Counter = Counter()
+        self._stats: Dict[str, Counter] = {}
+        self._invalidations = 0
+        self._shared_errors = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    def get_or_load(
+        self,
+        namespace: str,
+        params: Dict[str, Any],
+        scope: CacheScope,
+        loader: Callable[[], T]
+    ) -> T:
+        """Вернуть закэшированный ответ или загрузить его и положить в оба уровня.
+        
+        Значение должно сериализоваться в JSON и не изменяться вызывающим кодом:
+        из локального уровня возвращается тот же объект.
+        """
+        if not settings.cache_enabled:
+            return loader()
+        
+        generations = self._read_generations(scope)
+        if generations is None:
+            # Без поколений нельзя проверить свежесть записи: идем в БД мимо кэша
+            self._count(namespace, "misses")
+            return loader()
+        
+        key = self._key(namespace, params, scope, generations)
+        local = self._local_tier()
+        
+        found, value = local.get(key)
+        if found:
+            self._count(namespace, "local_hits")
+            return value
+        
+        shared = self._shared_tier()
+        if shared is not None:
+            raw = self._call_shared(lambda: shared.get_many([key])[0])
+            if raw is not None:
+                value = json.loads(raw)
+                local.set(key, value)
+                self._count(namespace, "shared_hits")
+                return value
+        
+        self._count(namespace, "misses")
+        value = loader()
+        
+        local.set(key, value)
+        if shared is not None:
+            raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            self._call_shared(lambda: shared.set(key, raw, settings.cache_ttl))
+        
+        return value
+    
+    def invalidate(self, store: str, app_type: str) -> None:
+        """Сбросить записи, на которые влияют отзывы пары (store, app_type)."""
+        self.invalidate_many([(store, app_type)])
+    
+    def invalidate_many(self, scopes: Iterable[CacheScope]) -> None:
+        names = set()
+        for store, app_type in scopes:
+            names.update({
+                _scope_name((store, app_type)),
+                _scope_name((store, None)),
+                _scope_name((None, app_type)),
+                _scope_name((None, None)),
+            })
+        self._bump(names)
+    
+    def invalidate_all(self) -> None:
+        """Сбросить все записи (например, после ручной правки данных в БД)."""
+        self._bump({_EPOCH})
+    
+    def stats(self) -> Dict[str, Any]:
+        """Попадания по уровням и доля попаданий по каждому пространству ключей."""
+        with self._lock:
+            namespaces = {
+                namespace: _with_hit_ratio(dict(counter))
+                for namespace, counter in self._stats.items()
+            }
+            total = sum(self._stats.values(), Counter())
+            invalidations = self._invalidations
+            shared_errors = self._shared_errors
+        
+        shared = self._shared_tier() if settings.cache_enabled else None
+        return {
+            "enabled": settings.cache_enabled,
+            "local_entries": len(self._local) if self._local is not None else 0,
+            "shared_tier": shared.name if shared is not None else None,
+            "invalidations": invalidations,
+            "shared_errors": shared_errors,
+            **_with_hit_ratio({
+                "local_hits": total["local_hits"],
+                "shared_hits": total["shared_hits"],
+                "misses": total["misses"],
+            }),
+            "namespaces": namespaces,
+        }
+    
+    def _bump(self, names: Iterable[str]) -> None:
+        names = sorted(names)
+        if not names:
+            return
+        
+        with self._lock:
+            self._generations.update(names)
+            self._invalidations += 1
+        
+        shared = self._shared_tier() if settings.cache_enabled else None
+        if shared is not None:
+            for name in names:
+                self._call_shared(lambda name=name: shared.incr(self._generation_key(name)))
+    
+    def _read_generations(self, scope: CacheScope) -> Optional[Tuple[int, int]]:
+        names = (_EPOCH, _scope_name(scope))
+        
+        shared = self._shared_tier()
+        if shared is None:
+            with self._lock:
+                return tuple(self._generations[name] for name in names)
+        
+        failed = object()
+        values = self._call_shared(
+            lambda: shared.get_many([self._generation_key(name) for name in names]),
+            default=failed
+        )
+        if values is failed:
+            return None
+        return tuple(int(value or 0) for value in values)
+    
+    def _key(
+        self,
+        namespace: str,
+        params: Dict[str, Any],
+        scope: CacheScope,
+        generations: Tuple[int, int]
+    ) -> str:
+        params_json = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+        digest = hashlib.blake2b(params_json.encode("utf-8"), digest_size=16).hexdigest()
+        epoch, generation = generations
+        return (
+            f"{settings.cache_key_prefix}{namespace}:{_scope_name(scope)}:"
+            f"{epoch}.{generation}:{digest}"
+        )
+    
+    def _generation_key(self, name: str) -> str:
+        return f"{settings.cache_key_prefix}gen:{name}"
+    
+    def _local_tier(self) -> LRUCache:
+        if self._local is None:
+            with self._lock:
+                if self._local is None:
+                    self._local = LRUCache(settings.cache_max_entries, settings.cache_ttl)
+        return self._local
+    
+    def _shared_tier(self) -> Optional[SharedCacheTier]:
+        if not self._shared_initialized:
+            with self._lock:
+                if not self._shared_initialized:
+                    self._shared = self._create_shared_tier()
+                    self._shared_initialized = True
+        return self._shared
+    
+    def _create_shared_tier(self) -> Optional[SharedCacheTier]:
+        backend = settings.cache_shared_backend
+        if not backend:
+            return None
+        if backend == "local":
+            return LocalSharedTier()
+        if backend == "redis":
+            if redis is None:
+                self.logger.error("CACHE_SHARED_BACKEND=redis requires redis to be installed")
+                return None
+            return RedisSharedTier(settings.cache_shared_url)
+        
+        self.logger.error(f"Unknown cache shared backend: {backend}")
+        return None
+    
+    def _call_shared(self, call: Callable[[], Any], default: Any = None) -> Any:
+        """Вызов общего уровня; его недоступность не должна ломать чтение."""
+        try:
+            return call()
+        except Exception as e:
+            self.logger.warning(f"Shared cache tier error: {e}")
+            with self._lock:
+                self._shared_errors += 1
+            return default
+    
+    def _count(self, namespace: str, outcome: str) -> None:
+        with self._lock:
+            self._stats.setdefault(namespace, Counter())[outcome] += 1
+
+
+def _scope_name(scope: CacheScope) -> str:
+    store, app_type = scope
+    return f"{store or _ANY}/{app_type or _ANY}"
+
+
+def _with_hit_ratio(counters: Dict[str, int]) -> Dict[str, Any]:
+    hits = counters.get("local_hits", 0) + counters.get("shared_hits", 0)
+    total = hits + counters.get("misses", 0)
+    return {**counters, "hit_ratio": round(hits / total, 4) if total else None}
+
+
+query_cache = QueryCache()
\ No newline at end of file
@@ -0,0 +1,101 @@
+from typing import Any, Dict
+import logging
+
+from sqlalchemy import func, select
+
+from app.core.database import get_db_session
+from app.models.database import Review
+from app.models.requests import RecentReviewsRequest, ReviewsFilter
+from app.services.archive import load_archived_texts
+from app.services.cache import query_cache
+from app.services.queries import apply_review_filters
+
+
+class ReviewDashboardService:
+    """Агрегаты и последние отзывы для дашбордов; ответы читаются через кэш."""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    def counts(self, filters: ReviewsFilter) -> Dict[str, Any]:
+        """Количество отзывов по приложениям: всего, обработано и по категориям."""
+        return query_cache.get_or_load(
+            "counts", filters.dict(), (filters.store, filters.app_type),
+            lambda: self._load_counts(filters)
+        )
+    
+    def recent(self, recent_request: RecentReviewsRequest) -> Dict[str, Any]:
+        """Последние отзывы по дате, новые сначала."""
+        return query_cache.get_or_load(
+            "recent", recent_request.dict(), (recent_request.store, recent_request.app_type),
+            lambda: self._load_recent(recent_request)
+        )
+    
+    def _load_counts(self, filters: ReviewsFilter) -> Dict[str, Any]:
+        statement = apply_review_filters(
+            select(
+                Review.store,
+                Review.app_type,
+                Review.review_category,
+                func.count().label("total"),
+                func.count().filter(Review.is_processed == True).label("processed")
+            ),
+            filters
+        ).group_by(Review.store, Review.app_type, Review.review_category)
+        
+        with get_db_session() as session:
+            rows = session.execute(statement).all()
+        
+        apps: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            app = apps.setdefault((row.store, row.app_type), {
+                "store": row.store,
+                "app_type": row.app_type,
+                "total": 0,
+                "processed": 0,
+                "categories": {}
+            })
+            app["total"] += row.total
+            app["processed"] += row.processed
+            if row.review_category is not None:
+                app["categories"][row.review_category] = row.total
+        
+        results = sorted(apps.values(), key=lambda app: (app["store"], app["app_type"]))
+        for app in results:
+            app["unprocessed"] = app["total"] - app["processed"]
+        
+        self.logger.info(f"Loaded review counts for {len(results)} apps")
+        return {"apps": results}
+    
+    def _load_recent(self, recent_request: RecentReviewsRequest) -> Dict[str, Any]:
+        statement = apply_review_filters(
+            select(
+                Review.id,
+                Review.store,
+                Review.app_type,
+                Review.score,
+                Review.date,
+                Review.app_version,
+                Review.review_category,
+                Review.text,
+                Review.is_archived
+            ),
+            recent_request
+        ).order_by(Review.date.desc(), Review.id).limit(recent_request.limit)
+        
+        with get_db_session() as session:
+            rows = session.execute(statement).all()
+            archived_texts = load_archived_texts(
+                session, [row.id for row in rows if row.is_archived]
+            )
+        
+        results = []
+        for row in rows:
+            data = dict(row._mapping)
+            del data["is_archived"]
+            data["text"] = archived_texts.get(row.id, row.text)
+            data["id"] = str(row.id)
+            data["date"] = row.date.isoformat()
+            results.append(data)
+        
+        return {"results": results}
\ No newline at end of file
@@ -0,0 +1,201 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+
+from app.core.config import settings
+
+
+FINGERPRINT_BITS = 64
+
+# Отрицание меняет смысл отзыва, почти не меняя текст: "вылетает" / "не вылетает"
+NEGATORS = frozenset({"не", "нет", "ни"})
+# Вес признака "не <слово>" в SimHash относительно обычного слова
+NEGATION_WEIGHT = 8
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# Каждый байт хеша раскладывается в 8 "дорожек" по 32 бита, чтобы складывать
+# голоса SimHash по всем 64 битам одной операцией сложения длинных чисел.
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_BYTE_SPREAD = [
+    sum(((byte >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8))
+    for byte in range(256)
+]
+
+
+def normalize_text(text: str) -> str:
+    """Нормализовать текст: регистр, пунктуация, эмодзи, пробелы."""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def _feature_hash(feature: str) -> int:
+    """Стабильный 64-битный хеш признака."""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _negations(words: Sequence[str]) -> FrozenSet[Tuple[str, str]]:
+    """Отрицания текста: пары (отрицание, следующее слово)."""
+    return frozenset(
+        (word, words[index + 1] if index + 1 < len(words) else "")
+        for index, word in enumerate(words)
+        if word in NEGATORS
+    )
+
+
+def _features(normalized: str) -> Counter:
+    """Признаки текста: слова, символьные триграммы внутри слов и отрицания."""
+    features: Counter = Counter()
+    words = normalized.split()
+    for word in words:
+        features[word] += 1
+        padded = f" {word} "
+        for start in range(len(padded) - 2):
+            features[padded[start:start + 3]] += 1
+    for negator, word in _negations(words):
+        features[f"{negator} {word}"] += NEGATION_WEIGHT
+    return features
+
+
+def _token_similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Коэффициент Жаккара множеств слов."""
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def simhash(normalized: str) -> int:
+    """Посчитать 64-битный SimHash нормализованного текста."""
+    features = _features(normalized)
+    if not features:
+        return 0
+    
+    votes = 0
+    for feature, weight in features.items():
+        value = _feature_hash(feature)
+        spread = 0
+        for index in range(FINGERPRINT_BITS // 8):
+            spread |= _BYTE_SPREAD[(value >> (index * 8)) & 0xFF] << (index * 8 * _LANE_BITS)
+        votes += spread * weight
+    
+    total = sum(features.values())
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if 2 * ((votes >> (bit * _LANE_BITS)) & _LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def _hamming_distance(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+class _Leader(NamedTuple):
+    """Представитель группы: то, с чем сравниваются кандидаты из LSH."""
+    fingerprint: int
+    tokens: FrozenSet[str]
+    negations: FrozenSet[Tuple[str, str]]
+
+
+class NearDuplicateGrouper:
+    """Группировка почти одинаковых отзывов через SimHash и LSH по полосам битов.
+    
+    Кандидат из LSH попадает в группу, только если совпадают его отрицания с
+    представителем и множества слов достаточно похожи: близость отпечатков сама по
+    себе не отличает "приходят" от "не приходят".
+    """
+    
+    def __init__(self, max_distance: int = None, min_token_similarity: float = None):
+        self.max_distance = (
+            settings.dedup_max_hamming_distance if max_distance is None else max_distance
+        )
+        self.min_token_similarity = (
+            settings.dedup_min_token_similarity
+            if min_token_similarity is None else min_token_similarity
+        )
+        # Если отпечатки отличаются не более чем в k битах, то хотя бы одна
+        # из k + 1 полос совпадает полностью
+        self.bands = self._band_masks(self.max_distance + 1)
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    @staticmethod
+    def _band_masks(count: int) -> List[Tuple[int, int]]:
+        """Разбить 64 бита отпечатка на полосы (сдвиг, маска)."""
+        count = max(1, min(count, FINGERPRINT_BITS))
+        bands = []
+        start = 0
+        for index in range(count):
+            width = FINGERPRINT_BITS // count + (1 if index < FINGERPRINT_BITS % count else 0)
+            bands.append((start, (1 << width) - 1))
+            start += width
+        return bands
+    
+    def group(self, texts: Sequence[str]) -> List[List[int]]:
+        """Сгруппировать тексты, первый индекс группы - ее представитель."""
+        groups: List[List[int]] = []
+        exact: Dict[str, int] = {}
+        leaders: Dict[int, _Leader] = {}
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        
+        for index, text in enumerate(texts):
+            normalized = normalize_text(text)
+            
+            # Тексты без слов (только эмодзи/пунктуация) не сравниваем
+            if not normalized:
+                groups.append([index])
+                continue
+            
+            if normalized in exact:
+                groups[exact[normalized]].append(index)
+                continue
+            
+            words = normalized.split()
+            leader = _Leader(simhash(normalized), frozenset(words), _negations(words))
+            keys = [
+                (band, (leader.fingerprint >> shift) & mask)
+                for band, (shift, mask) in enumerate(self.bands)
+            ]
+            
+            group_index = self._find_leader(leader, keys, buckets, leaders)
+            if group_index is None:
+                group_index = len(groups)
+                groups.append([index])
+                leaders[group_index] = leader
+                for key in keys:
+                    buckets.setdefault(key, []).append(group_index)
+            else:
+                groups[group_index].append(index)
+            
+            exact[normalized] = group_index
+        
+        self.logger.debug(f"Grouped {len(texts)} texts into {len(groups)} groups")
+        return groups
+    
+    def _find_leader(
+        self,
+        candidate: _Leader,
+        keys: List[Tuple[int, int]],
+        buckets: Dict[Tuple[int, int], List[int]],
+        leaders: Dict[int, _Leader]
+    ) -> Optional[int]:
+        """Найти группу, лидер которой достаточно близок к кандидату."""
+        checked = set()
+        for key in keys:
+            for group_index in buckets.get(key, ()):
+                if group_index in checked:
+                    continue
+                checked.add(group_index)
+                if self._is_near_duplicate(candidate, leaders[group_index]):
+                    return group_index
+        return None
+    
+    def _is_near_duplicate(self, candidate: _Leader, leader: _Leader) -> bool:
+        return (
+            _hamming_distance(candidate.fingerprint, leader.fingerprint) <= self.max_distance
+            and candidate.negations == leader.negations
+            and _token_similarity(candidate.tokens, leader.tokens) >= self.min_token_similarity
+        )
\ No newline at end of file
@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.models.database import Review
+from app.models.requests import ExportRequest, ReviewsFilter
+from app.services.archive import load_archived_texts
+from app.services.queries import apply_review_filters
+from app.utils.exceptions import ExportError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow - опциональная зависимость
+    pa = None
+    pq = None
+
+
+EXPORT_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "store",
+    "app_type",
+    "score",
+    "text",
+    "date",
+    "app_version",
+    "likes_count",
+    "dislikes_count",
+    "device_manufacturer",
+    "device_model",
+    "device_firmware",
+    "is_processed",
+    "review_category",
+    "store_review_id",
+    "created_at",
+    "updated_at",
+)
+
+_ID_INDEX = EXPORT_COLUMNS.index("id")
+_TEXT_INDEX = EXPORT_COLUMNS.index("text")
+
+CONTENT_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _to_text(value: Any) -> Any:
+    """Привести значение к виду, пригодному для текстовых форматов."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файловый объект, накапливающий записанные байты до выгрузки в поток."""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        """Забрать накопленные байты."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ReviewExporter:
+    """Сервис потоковой выгрузки отзывов."""
+    
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or settings.export_batch_size
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+        self._encoders: Dict[str, Callable[[Iterator[List[Sequence[Any]]]], Iterator[bytes]]] = {
+            "ndjson": self._encode_ndjson,
+            "csv": self._encode_csv,
+            "parquet": self._encode_parquet,
+        }
+    
+    def check_format(self, export_format: str) -> None:
+        """Проверить, что формат выгрузки доступен."""
+        if export_format not in self._encoders:
+            raise ExportError(f"Unsupported export format: {export_format}")
+        if export_format == "parquet" and pa is None:
+            raise ExportError("Parquet export requires pyarrow to be installed")
+    
+    def filename(self, export_request: ExportRequest) -> str:
+        """Имя файла выгрузки."""
+        name = f"reviews.{export_request.format}"
+        return f"{name}.gz" if export_request.gzip else name
+    
+    def content_type(self, export_request: ExportRequest) -> str:
+        """MIME-тип выгрузки."""
+        if export_request.gzip:
+            return "application/gzip"
+        return CONTENT_TYPES[export_request.format]
+    
+    def stream(self, export_request: ExportRequest) -> Iterator[bytes]:
+        """Потоково выгрузить отзывы в выбранном формате."""
+        self.check_format(export_request.format)
+        self.logger.info(f"Starting reviews export: {export_request}")
+        
+        encoder = self._encoders[export_request.format]
+        chunks = encoder(self._iter_batches(export_request))
+        if export_request.gzip:
+            chunks = self._gzip(chunks)
+        
+        yield from chunks
+    
+    def _iter_batches(self, filters: ReviewsFilter) -> Iterator[List[Sequence[Any]]]:
+        """Читать отзывы пачками через серверный курсор."""
+        columns = [getattr(Review, name) for name in EXPORT_COLUMNS]
+        statement = apply_review_filters(
+            select(*columns, Review.is_archived), filters
+        ).order_by(Review.date)
+        total = 0
+        
+        with get_db_session() as session:
+            result = session.execute(
+                statement.execution_options(stream_results=True, yield_per=self.batch_size)
+            )
+            for partition in result.partitions():
+                total += len(partition)
+                yield self._rehydrate(session, partition)
+        
+        self.logger.info(f"Exported {total} reviews")
+    
+    def _rehydrate(self, session: Session, rows: List[Sequence[Any]]) -> List[Sequence[Any]]:
+        """Подставить тексты архивных отзывов и убрать служебную колонку is_archived."""
+        archived_texts = load_archived_texts(
+            session, [row[_ID_INDEX] for row in rows if row[-1]]
+        )
+        if not archived_texts:
+            return [row[:-1] for row in rows]
+        
+        rehydrated = []
+        for row in rows:
+            values = list(row[:-1])
+            if row[-1]:
+                values[_TEXT_INDEX] = archived_texts.get(row[_ID_INDEX], values[_TEXT_INDEX])
+            rehydrated.append(values)
+        return rehydrated
+    
+    def _encode_ndjson(self, batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+        """Кодирование в NDJSON."""
+        for batch in batches:
+            lines = [
+                json.dumps(
+                    {name: _to_text(value) for name, value in zip(EXPORT_COLUMNS, row)},
+                    ensure_ascii=False
+                )
+                for row in batch
+            ]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+    
+    def _encode_csv(self, batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+        """Кодирование в CSV."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        
+        for batch in batches:
+            writer.writerows([_to_text(value) for value in row] for row in batch)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+        
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    
+    def _encode_parquet(self, batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+        """Кодирование в Parquet, одна row group на пачку."""
+        schema = pa.schema([
+            ("id", pa.string()),
+            ("store", pa.string()),
+            ("app_type", pa.string()),
+            ("score", pa.int32()),
+            ("text", pa.string()),
+            ("date", pa.timestamp("us")),
+            ("app_version", pa.string()),
+            ("likes_count", pa.int32()),
+            ("dislikes_count", pa.int32()),
+            ("device_manufacturer", pa.string()),
+            ("device_model", pa.string()),
+            ("device_firmware", pa.string()),
+            ("is_processed", pa.bool_()),
+            ("review_category", pa.string()),
+            ("store_review_id", pa.string()),
+            ("created_at", pa.timestamp("us")),
+            ("updated_at", pa.timestamp("us")),
+        ])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        
+        try:
+            for batch in batches:
+                columns = list(zip(*batch))
+                arrays = {
+                    name: list(values) for name, values in zip(EXPORT_COLUMNS, columns)
+                }
+                arrays["id"] = [str(value) for value in arrays["id"]]
+                writer.write_table(pa.Table.from_pydict(arrays, schema=schema))
+                
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        
+        data = sink.drain()
+        if data:
+            yield data
+    
+    def _gzip(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Потоковое сжатие gzip."""
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        
+        yield compressor.flush()
\ No newline at end of file
@@ -1,44 +1,149 @@
+import asyncio
+import re
+import threading
+import httpx
 import requests
-from typing import Dict, Any, Optional
+from collections import Counter
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 import logging
 
 from app.core.config import settings
-from app.models.reviews import ProcessedReview
+from app.models.reviews import MetricReview
 from app.utils.exceptions import MetricsAPIError
 
 
-class MetricsService:
-    """Сервис для отправки метрик."""
+_APP_VERSION_PATTERN = re.compile(r"\d+(?:\.\d+)*")
+
+
+def app_version_bucket(app_version: str, depth: int) -> str:
+    """Первые depth числовых компонентов версии ("7.3.1 (1234)" -> "7.3") или "other"."""
+    match = _APP_VERSION_PATTERN.match(app_version or "")
+    if not match:
+        return "other"
+    return ".".join(match.group().split(".")[:depth])
+
+
+# Метки агрегированных метрик; у каждой ограниченное число значений
+AGGREGATE_LABELS: Dict[str, Callable[[MetricReview], str]] = {
+    "store": lambda review: review.store,
+    "app_type": lambda review: review.app_type,
+    "category": lambda review: review.review_category or "other",
+    "app_version": lambda review: app_version_bucket(
+        review.app_version, settings.metrics_app_version_depth
+    ),
+}
+
+
+class MetricsAggregator:
+    """Счетчики новых отзывов по ограниченному набору меток и окнам времени.
+    
+    Отзывы добавляются в момент фиксации их классификации, поэтому каждый
+    учитывается один раз; при отправке выдаются и обнуляются только приросты.
+    """
+    
+    def __init__(self):
+        self._counters: Counter = Counter()
+        self._label_names: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    @property
+    def label_names(self) -> List[str]:
+        """Метки из настроек, проверенные при первом обращении."""
+        if self._label_names is None:
+            with self._lock:
+                if self._label_names is None:
+                    self._label_names = self._validate_labels(settings.metrics_aggregate_labels)
+        return self._label_names
+    
+    def _validate_labels(self, configured: List[str]) -> List[str]:
+        names = [name for name in configured if name in AGGREGATE_LABELS]
+        if len(names) != len(configured):
+            self.logger.warning(
+                f"Unsupported aggregate metric labels ignored: "
+                f"{set(configured) - set(AGGREGATE_LABELS)}"
+            )
+        return names
+    
+    def add_many(self, reviews: Iterable[MetricReview]) -> None:
+        label_names = self.label_names
+        window = settings.metrics_aggregate_window
+        
+        keys = Counter(
+            (
+                tuple(AGGREGATE_LABELS[name](review) for name in label_names),
+                int(review.date.timestamp()) // window * window
+            )
+            for review in reviews
+        )
+        with self._lock:
+            self._counters.update(keys)
+    
+    def drain(self) -> List[Dict[str, Any]]:
+        """Забрать накопленные приросты в виде метрик и обнулить счетчики."""
+        label_names = self.label_names
+        with self._lock:
+            counters, self._counters = self._counters, Counter()
+        
+        return [
+            {
+                "metric_name": "new_reviews",
+                "labels": dict(zip(label_names, label_values)),
+                "value": count,
+                "timestamp": window_start,
+                "interval": settings.metrics_aggregate_window
+            }
+            for (label_values, window_start), count in counters.items()
+        ]
+    
+    def restore(self, metrics: List[Dict[str, Any]]) -> None:
+        """Вернуть неотправленные приросты, чтобы отправить их в следующий раз."""
+        with self._lock:
+            for metric_data in metrics:
+                key = (tuple(metric_data["labels"].values()), metric_data["timestamp"])
+                self._counters[key] += metric_data["value"]
+
+
+class _MetricsProtocol:
+    """Общая часть синхронного и асинхронного сервисов метрик."""
     
     def __init__(self):
         self.api_url = settings.metrics_api_url
         self.api_key = settings.metrics_api_key
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
     
-    def send_review_metric(self, review: ProcessedReview) -> None:
-        """Отправить метрику для обработанного отзыва."""
-        if not self.api_url:
-            self.logger.debug("Metrics API URL not configured, skipping metrics")
-            return
+    def _get_headers(self) -> Dict[str, str]:
+        """Получить заголовки для запросов."""
+        headers = {
+            "Content-Type": "application/json"
+        }
         
-        metric_data = self._build_metric_data(review)
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
         
-        try:
-            self._send_metric(metric_data)
-            self.logger.debug(f"Sent metric for review {review.id}")
-            
-        except MetricsAPIError as e:
-            self.logger.error(f"Failed to send metric for review {review.id}: {e}")
-            # Не прерываем обработку из-за ошибок метрик
-            raise  # Но пробрасываем исключение для обработчика
-        except Exception as e:
-            self.logger.error(f"Unexpected error sending metric for review {review.id}: {e}")
-            raise MetricsAPIError(f"Unexpected error sending metric: {e}")
+        return headers
+    
+    def _finish_aggregated(
+        self,
+        aggregator: MetricsAggregator,
+        metrics: List[Dict[str, Any]],
+        failed: List[Dict[str, Any]]
+    ) -> Tuple[int, int, int]:
+        # Неотправленные приросты не теряются, а уходят со следующей отправкой
+        aggregator.restore(failed)
+        
+        sent_reviews = sum(metric_data["value"] for metric_data in metrics) - sum(
+            metric_data["value"] for metric_data in failed
+        )
+        self.logger.info(
+            f"Sent {len(metrics) - len(failed)} aggregated metrics for {sent_reviews} reviews"
+        )
+        return len(metrics) - len(failed), len(failed), sent_reviews
     
-    def _build_metric_data(self, review: ProcessedReview) -> Dict[str, Any]:
+    def _build_metric_data(self, review: MetricReview) -> Dict[str, Any]:
         """Построить данные метрики."""
         labels = {
-            "review_id": review.id,
+            "review_id": str(review.id),
             "type": review.review_category or "other",
             "store": review.store,
             "app_type": review.app_type,
@@ -60,24 +165,126 @@ class MetricsService:
             "value": 1,
             "timestamp": review.date.timestamp()
         }
+
+
+class MetricsService(_MetricsProtocol):
+    """Сервис для отправки метрик."""
     
-    def _send_metric(self, metric_data: Dict[str, Any]) -> None:
-        """Отправить метрику в систему мониторинга."""
-        headers = {
-            "Content-Type": "application/json"
-        }
+    def send_review_metric(self, review: MetricReview) -> None:
+        """Отправить метрику для обработанного отзыва."""
+        if not self.api_url:
+            self.logger.debug("Metrics API URL not configured, skipping metrics")
+            return
         
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        metric_data = self._build_metric_data(review)
+        
+        try:
+            self._send_metric(metric_data)
+            self.logger.debug(f"Sent metric for review {review.id}")
+        
+        except MetricsAPIError as e:
+            self.logger.error(f"Failed to send metric for review {review.id}: {e}")
+            # Не прерываем обработку из-за ошибок метрик
+            raise  # Но пробрасываем исключение для обработчика
+        except Exception as e:
+            self.logger.error(f"Unexpected error sending metric for review {review.id}: {e}")
+            raise MetricsAPIError(f"Unexpected error sending metric: {e}")
+    
+    def send_aggregated_metrics(self, aggregator: MetricsAggregator) -> Tuple[int, int, int]:
+        """Отправить накопленные приросты: (отправлено, не отправлено, отзывов в отправленных)."""
+        if not self.api_url:
+            self.logger.debug("Metrics API URL not configured, skipping metrics")
+            aggregator.drain()
+            return 0, 0, 0
+        
+        failed: List[Dict[str, Any]] = []
+        metrics = aggregator.drain()
+        for metric_data in metrics:
+            try:
+                self._send_metric(metric_data)
+            except Exception as e:
+                self.logger.error(f"Failed to send aggregated metric {metric_data['labels']}: {e}")
+                failed.append(metric_data)
         
+        return self._finish_aggregated(aggregator, metrics, failed)
+    
+    def _send_metric(self, metric_data: Dict[str, Any]) -> None:
+        """Отправить метрику в систему мониторинга."""
         try:
             response = requests.post(
                 f"{self.api_url}/metrics",
                 json=metric_data,
-                headers=headers,
+                headers=self._get_headers(),
                 timeout=10
             )
             response.raise_for_status()
-            
+        
         except requests.RequestException as e:
-            raise MetricsAPIError(f"Failed to send metric: {e}")
\ No newline at end of file
+            raise MetricsAPIError(f"Failed to send metric: {e}")
+
+
+class AsyncMetricsService(_MetricsProtocol):
+    """Асинхронный сервис для отправки метрик."""
+    
+    def __init__(self, http_client: httpx.AsyncClient, concurrency: Optional[int] = None):
+        super().__init__()
+        self.http_client = http_client
+        self.semaphore = asyncio.Semaphore(concurrency or settings.async_metrics_concurrency)
+    
+    async def send_review_metric(self, review: MetricReview) -> None:
+        """Отправить метрику для обработанного отзыва."""
+        if not self.api_url:
+            self.logger.debug("Metrics API URL not configured, skipping metrics")
+            return
+        
+        metric_data = self._build_metric_data(review)
+        
+        try:
+            await self._send_metric(metric_data)
+            self.logger.debug(f"Sent metric for review {review.id}")
+        
+        except MetricsAPIError as e:
+            self.logger.error(f"Failed to send metric for review {review.id}: {e}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error sending metric for review {review.id}: {e}")
+            raise MetricsAPIError(f"Unexpected error sending metric: {e}")
+    
+    async def send_aggregated_metrics(self, aggregator: MetricsAggregator) -> Tuple[int, int, int]:
+        """Отправить накопленные приросты: (отправлено, не отправлено, отзывов в отправленных)."""
+        if not self.api_url:
+            self.logger.debug("Metrics API URL not configured, skipping metrics")
+            aggregator.drain()
+            return 0, 0, 0
+        
+        metrics = aggregator.drain()
+        results = await asyncio.gather(
+            *(self._send_metric(metric_data) for metric_data in metrics),
+            return_exceptions=True
+        )
+        
+        failed: List[Dict[str, Any]] = []
+        for metric_data, result in zip(metrics, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Failed to send aggregated metric {metric_data['labels']}: {result}")
+                failed.append(metric_data)
+        
+        return self._finish_aggregated(aggregator, metrics, failed)
+    
+    async def _send_metric(self, metric_data: Dict[str, Any]) -> None:
+        """Отправить метрику в систему мониторинга."""
+        async with self.semaphore:
+            try:
+                response = await self.http_client.post(
+                    f"{self.api_url}/metrics",
+                    json=metric_data,
+                    headers=self._get_headers(),
+                    timeout=10
+                )
+                response.raise_for_status()
+            
+            except httpx.HTTPError as e:
+                raise MetricsAPIError(f"Failed to send metric: {e}")
+
+
+metrics_aggregator = MetricsAggregator()
\ No newline at end of file
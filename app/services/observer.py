@@ -1,35 +1,127 @@
-from typing import List, Dict, Type
+import hashlib
+import random
+import uuid
+from collections import Counter, defaultdict
+from functools import cached_property
+from typing import Any, Callable, List, Dict, Optional, Tuple, Type
 from datetime import datetime
+from sqlalchemy import (
+    Boolean, String, and_, bindparam, literal_column, not_, or_, select, text
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID, insert
+from sqlalchemy.sql.expression import ColumnElement
 from sqlalchemy.orm import Session
 import logging
 
+from app.core.config import settings
 from app.core.database import get_db_session
 from app.models.database import Review
-from app.models.requests import ReviewsRequest
-from app.models.reviews import RawReviewData, ProcessedReview
+from app.models.requests import AppInfo, ReviewsRequest
+from app.models.reviews import RawReviewData, PendingReview, MetricReview, LLMAnalysisResult
 from app.clients.base import BaseStoreClient, BaseLLMClient
 from app.clients.rustore import RuStoreClient
 from app.clients.llm import LLMClient
-from app.services.metrics import MetricsService
-from app.utils.exceptions import ReviewServiceError, DatabaseError, StoreAPIError, LLMAPIError
+from app.services.archive import load_archived_texts
+from app.services.cache import query_cache
+from app.services.dedup import NearDuplicateGrouper
+from app.services.metrics import MetricsService, metrics_aggregator
+from app.services.preclassifier import PreClassifier
+from app.services.singleflight import singleflight
+from app.utils.exceptions import (
+    ReviewServiceError, DatabaseError, StoreAPIError, LLMAPIError, LLMUnavailableError,
+    LLMPartialResultError
+)
+
+
+# Идентификаторы и хэши передаются одним массивом, а не списком параметров
+REVIEW_IDS_TYPE = ARRAY(UUID(as_uuid=True))
+CONTENT_HASHES_TYPE = ARRAY(String(32))
+
+# Результаты анализа пишутся одним запросом; analysis дополняется (||), а не заменяется.
+# Отзыв, измененный в сторе после чтения, имеет другой хэш и остается необработанным.
+# updated_at не трогаем при дозаполнении уже обработанных, чтобы не слать метрики повторно.
+# Первичная классификация пишет только в необработанные отзывы: если отзыв уже
+# классифицировал параллельный запуск, он не попадет в RETURNING и не будет учтен в
+# агрегированных метриках дважды
+STORE_ANALYSIS_STATEMENT = text("""
+    UPDATE reviews
+    SET analysis = reviews.analysis || v.patch,
+        review_category = COALESCE(v.category, reviews.review_category),
+        updated_at = CASE WHEN reviews.is_processed THEN reviews.updated_at ELSE :updated_at END,
+        is_processed = true
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:hashes AS varchar[]),
+        CAST(:categories AS varchar[]),
+        CAST(:patches AS jsonb[])
+    ) AS v(id, content_hash, category, patch)
+    WHERE reviews.id = v.id AND reviews.content_hash = v.content_hash
+        AND reviews.is_processed = :backfill
+    RETURNING reviews.id, reviews.app_type, reviews.store, reviews.date, reviews.app_version,
+        reviews.review_category, reviews.device_manufacturer, reviews.device_model,
+        reviews.device_firmware
+""").bindparams(
+    bindparam("ids", type_=REVIEW_IDS_TYPE),
+    bindparam("hashes", type_=CONTENT_HASHES_TYPE),
+    bindparam("categories", type_=ARRAY(String(50))),
+    bindparam("patches", type_=ARRAY(JSONB)),
+    bindparam("backfill", type_=Boolean)
+)
+
+# Строк в одном INSERT ... ON CONFLICT (лимит Postgres - 65535 параметров на запрос)
+UPSERT_BATCH_SIZE = 1000
+
+
+def review_content_hash(text: str, rating: int) -> str:
+    """Хэш содержимого отзыва; совпадает с md5(score::text || ':' || text) в Postgres."""
+    return hashlib.md5(f"{rating}:{text}".encode("utf-8"), usedforsecurity=False).hexdigest()
 
 
 class ReviewObserver:
     """Сервис для обработки отзывов."""
     
-    def __init__(self):
+    def __init__(self, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
         self.store_clients: Dict[str, Type[BaseStoreClient]] = {
             "rustore": RuStoreClient
         }
-        self.llm_client = LLMClient()
-        self.metrics_service = MetricsService()
+        self.on_progress = on_progress
+        self.run_stats: Counter = Counter()
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
     
+    # Клиенты и модели создаются при первом использовании
+    @cached_property
+    def llm_client(self) -> BaseLLMClient:
+        return LLMClient()
+    
+    @cached_property
+    def metrics_service(self) -> MetricsService:
+        return MetricsService()
+    
+    @cached_property
+    def grouper(self) -> Optional[NearDuplicateGrouper]:
+        return NearDuplicateGrouper() if settings.dedup_enabled else None
+    
+    @cached_property
+    def preclassifier(self) -> Optional[PreClassifier]:
+        return PreClassifier() if settings.preclassifier_enabled else None
+    
+    def _emit(self, event: str, **data: Any) -> None:
+        """Сообщить о прогрессе обработки, если на него подписались."""
+        if self.on_progress:
+            self.on_progress({"event": event, **data})
+    
+    def _attach_llm_progress(self, client: Any) -> None:
+        """Сообщать о каждом классифицированном батче LLM."""
+        if self.on_progress:
+            client.on_batch_done = lambda count: self._emit("llm_batch_classified", reviews=count)
+    
     def process_reviews_request(self, request: ReviewsRequest) -> Dict[str, int]:
         """Обработать запрос на получение отзывов."""
         self.logger.info("Starting reviews processing")
         
         stats = {"new_reviews": 0, "processed_reviews": 0, "errors": 0}
+        self.run_stats = Counter()
+        self._attach_llm_progress(self.llm_client)
         
         try:
             # 1. Получить и сохранить новые отзывы
@@ -39,13 +131,15 @@ class ReviewObserver:
             # 2. Обработать необработанные отзывы через LLM
             processed_count = self._process_unprocessed_reviews()
             stats["processed_reviews"] = processed_count
+            self._emit("reviews_processed", processed_reviews=processed_count)
             
             # 3. Отправить метрики
             self._send_metrics_for_processed_reviews()
             
+            stats.update(self.run_stats)
             self.logger.info(f"Processing completed: {stats}")
             return stats
-            
+        
         except (StoreAPIError, LLMAPIError, DatabaseError) as e:
             self.logger.error(f"Service error during processing: {e}")
             stats["errors"] = 1
@@ -73,18 +167,23 @@ class ReviewObserver:
             
             for app in store_info.apps:
                 try:
-                    raw_reviews = client.get_reviews(app.package_name)
-                    new_count = self._save_reviews_to_db(
-                        raw_reviews, app.app_type, store_info.type
+                    # Одинаковая загрузка, уже идущая в другом запросе или реплике, не повторяется
+                    fetched, new_count, updated_count = singleflight.do(
+                        f"fetch:{store_type}:{app.package_name}",
+                        lambda: self._fetch_app_reviews(client, app, store_info.type),
+                        remote_result=(0, 0, 0)
                     )
                     total_new += new_count
-                    
+                    self._emit_app_fetched(store_info.type, app, fetched, new_count, updated_count)
+                
                 except StoreAPIError as e:
                     self.logger.error(f"Store API error for {app.package_name}: {e}")
+                    self._emit_app_failed(store_info.type, app, e)
                     errors += 1
                     continue
                 except Exception as e:
                     self.logger.error(f"Unexpected error fetching reviews for {app.package_name}: {e}")
+                    self._emit_app_failed(store_info.type, app, e)
                     errors += 1
                     continue
         
@@ -93,273 +192,511 @@ class ReviewObserver:
         
         return total_new
     
+    def _fetch_app_reviews(
+        self, 
+        client: BaseStoreClient, 
+        app: AppInfo, 
+        store: str
+    ) -> Tuple[int, int, int]:
+        """Получить и сохранить отзывы одного приложения: (получено, новых, измененных)."""
+        raw_reviews = client.get_reviews(app.package_name)
+        new_count, updated_count = self._save_reviews_to_db(raw_reviews, app.app_type, store)
+        return len(raw_reviews), new_count, updated_count
+    
+    def _emit_app_fetched(
+        self, 
+        store: str, 
+        app: AppInfo, 
+        fetched: int, 
+        new_count: int, 
+        updated_count: int
+    ) -> None:
+        self.run_stats["updated_reviews"] += updated_count
+        self._emit(
+            "app_fetched", 
+            store=store, 
+            app_type=app.app_type, 
+            package_name=app.package_name,
+            fetched_reviews=fetched, 
+            new_reviews=new_count,
+            updated_reviews=updated_count
+        )
+    
+    def _emit_app_failed(self, store: str, app: AppInfo, error: Exception) -> None:
+        self._emit(
+            "app_failed", 
+            store=store, 
+            app_type=app.app_type, 
+            package_name=app.package_name, 
+            message=str(error)
+        )
+    
     def _save_reviews_to_db(
         self, 
         raw_reviews: List[RawReviewData], 
         app_type: str, 
         store: str
-    ) -> int:
-        """Сохранить отзывы в БД."""
-        new_count = 0
+    ) -> Tuple[int, int]:
+        """Сохранить отзывы в БД: (новых, измененных).
+        
+        Upsert по store_review_id; существующая строка перезаписывается только если
+        изменился хэш содержимого, и тогда отзыв снова уходит на классификацию.
+        """
+        written = self._upsert_reviews(raw_reviews, app_type, store)
+        new_count = sum(1 for _, inserted in written if inserted)
+        return new_count, len(written) - new_count
+    
+    def _upsert_reviews(
+        self, 
+        raw_reviews: List[RawReviewData], 
+        app_type: str, 
+        store: str
+    ) -> List[Tuple[uuid.UUID, bool]]:
+        """Записать отзывы в БД: (id, вставлен ли) для каждой новой или измененной строки."""
+        # В одном INSERT ... ON CONFLICT строка не может обновляться дважды
+        rows_by_id = {
+            raw_review.store_review_id: self._review_row(raw_review, app_type, store)
+            for raw_review in raw_reviews
+        }
+        rows = list(rows_by_id.values())
+        written: List[Tuple[uuid.UUID, bool]] = []
         
         try:
             with get_db_session() as session:
-                for raw_review in raw_reviews:
-                    try:
-                        # Проверить, существует ли отзыв
-                        existing = session.query(Review).filter(
-                            Review.store_review_id == raw_review.store_review_id
-                        ).first()
-                        
-                        if existing:
-                            continue
-                        
-                        # Создать новый отзыв
-                        review = Review(
-                            app_type=app_type,
-                            store=store,
-                            score=raw_review.rating,
-                            text=raw_review.text,
-                            date=max(raw_review.published_date, raw_review.written_date),
-                            app_version=raw_review.app_version,
-                            likes_count=raw_review.likes_count,
-                            dislikes_count=raw_review.dislikes_count,
-                            device_manufacturer=raw_review.device_manufacturer,
-                            device_model=raw_review.device_model,
-                            device_firmware=raw_review.device_firmware,
-                            store_review_id=raw_review.store_review_id,
-                            is_processed=False
+                for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                    written.extend(
+                        tuple(row) for row in session.execute(
+                            self._upsert_statement(rows[start:start + UPSERT_BATCH_SIZE])
                         )
-                        
-                        session.add(review)
-                        new_count += 1
-                        
-                    except Exception as e:
-                        self.logger.error(f"Error saving review {raw_review.store_review_id}: {e}")
-                        continue
-                
-                self.logger.info(f"Saved {new_count} new reviews to database")
+                    )
                 
+                new_count = sum(1 for _, inserted in written if inserted)
+                self.logger.info(
+                    f"Saved {new_count} new and {len(written) - new_count} "
+                    f"updated reviews to database"
+                )
+        
         except Exception as e:
             self.logger.error(f"Database error while saving reviews: {e}")
             raise DatabaseError(f"Failed to save reviews to database: {e}")
         
-        return new_count
+        if written:
+            query_cache.invalidate(store, app_type)
+        
+        return written
+    
+    def _review_row(self, raw_review: RawReviewData, app_type: str, store: str) -> Dict[str, Any]:
+        """Значения колонок для вставки отзыва."""
+        now = datetime.utcnow()
+        return {
+            "id": uuid.uuid4(),
+            "app_type": app_type,
+            "store": store,
+            "score": raw_review.rating,
+            "text": raw_review.text,
+            "date": max(raw_review.published_date, raw_review.written_date),
+            "app_version": raw_review.app_version,
+            "likes_count": raw_review.likes_count,
+            "dislikes_count": raw_review.dislikes_count,
+            "device_manufacturer": raw_review.device_manufacturer,
+            "device_model": raw_review.device_model,
+            "device_firmware": raw_review.device_firmware,
+            "store_review_id": raw_review.store_review_id,
+            "content_hash": review_content_hash(raw_review.text, raw_review.rating),
+            "is_processed": False,
+            "created_at": now,
+            "updated_at": now
+        }
+    
+    def _upsert_statement(self, rows: List[Dict[str, Any]]):
+        """INSERT ... ON CONFLICT, возвращающий признак вставки для каждой записанной строки."""
+        statement = insert(Review).values(rows)
+        excluded = statement.excluded
+        
+        return statement.on_conflict_do_update(
+            index_elements=[Review.store_review_id],
+            set_={
+                "score": excluded.score,
+                "text": excluded.text,
+                "date": excluded.date,
+                "app_version": excluded.app_version,
+                "likes_count": excluded.likes_count,
+                "dislikes_count": excluded.dislikes_count,
+                "device_manufacturer": excluded.device_manufacturer,
+                "device_model": excluded.device_model,
+                "device_firmware": excluded.device_firmware,
+                "content_hash": excluded.content_hash,
+                "is_processed": False,
+                "review_category": None,
+                "analysis": {},
+                "is_archived": False,
+                "updated_at": excluded.updated_at
+            },
+            # Неизмененные отзывы не переписываются и не попадают в RETURNING
+            where=Review.content_hash.is_distinct_from(excluded.content_hash)
+        ).returning(Review.id, literal_column("xmax = 0"))
     
     def _process_unprocessed_reviews(self) -> int:
-        """Обработать необработанные отзывы через LLM."""
+        """Обработать необработанные отзывы через LLM (один проход на все параллельные запросы).
+        
+        Проход, начатый до записи отзывов этим запросом, их не видит, поэтому
+        присоединяемся только к проходу, начатому позже (fresh).
+        """
+        return singleflight.do(
+            "stage:process_unprocessed", self._process_unprocessed_reviews_once,
+            remote_result=0, fresh=True
+        )
+    
+    def _process_unprocessed_reviews_once(self) -> int:
+        """Обработать необработанные отзывы и дозапросить недостающие типы анализа."""
+        processed_count = self._analyze_reviews(Review.is_processed == False)
+        self._backfill_missing_analysis()
+        return processed_count
+    
+    def _backfill_missing_analysis(self) -> None:
+        """Дозапросить недостающие типы анализа для части обработанных отзывов."""
+        if self.run_stats["llm_unavailable"]:
+            return
+        
+        self.run_stats["backfilled_reviews"] += self._analyze_reviews(
+            and_(Review.is_processed == True, self._missing_analysis_condition()),
+            limit=settings.llm_backfill_batch_size,
+            backfill=True
+        )
+    
+    def _analyze_reviews(
+        self, 
+        condition: ColumnElement, 
+        limit: Optional[int] = None, 
+        backfill: bool = False
+    ) -> int:
+        """Проанализировать отзывы, подходящие под условие, и сохранить результаты.
+        
+        Необработанным отзывам запрашиваются все типы анализа, при дозаполнении -
+        только отсутствующие или устаревшие; отзывы с одинаковым набором типов
+        анализируются вместе, все типы - за один запрос к LLM.
+        
+        Выбранные строки блокируются (FOR UPDATE SKIP LOCKED) до фиксации результатов:
+        параллельные запуски и реплики делят отзывы, а не отправляют одни и те же в LLM.
+        """
         try:
             with get_db_session() as session:
-                unprocessed_reviews = session.query(Review).filter(
-                    Review.is_processed == False
+                rows = session.execute(
+                    select(
+                        *(getattr(Review, field) for field in PendingReview._fields),
+                        Review.is_archived
+                    )
+                    .where(condition)
+                    .limit(limit)
+                    # Отзывы, которые сейчас анализирует другой запуск или реплика, пропускаем
+                    .with_for_update(of=Review, skip_locked=True)
                 ).all()
                 
-                if not unprocessed_reviews:
-                    self.logger.info("No unprocessed reviews found")
+                # Тексты архивных отзывов (при дозаполнении анализа) восстанавливаются из архива
+                archived_texts = load_archived_texts(
+                    session, [row.id for row in rows if row.is_archived]
+                )
+                reviews = [
+                    PendingReview(*row[:-1])._replace(text=archived_texts.get(row.id, row.text))
+                    for row in rows
+                ]
+                
+                if not reviews:
+                    if not backfill:
+                        self.logger.info("No unprocessed reviews found")
                     return 0
                 
-                self.logger.info(f"Processing {len(unprocessed_reviews)} unprocessed reviews")
+                action = "Backfilling analysis for" if backfill else "Processing"
+                self.logger.info(f"{action} {len(reviews)} reviews")
                 
-                # Подготовить тексты для анализа
-                review_texts = [review.text for review in unprocessed_reviews]
+                reviews_by_types: Dict[Tuple[str, ...], List[PendingReview]] = defaultdict(list)
+                for review in reviews:
+                    analysis_types = (
+                        self._missing_analysis_types(review.analysis)
+                        if backfill else settings.llm_analysis_types
+                    )
+                    reviews_by_types[tuple(analysis_types)].append(review)
                 
+                stored: List[MetricReview] = []
                 try:
-                    # Анализировать батчем
-                    analysis_results = self.llm_client.analyze_reviews_batch(review_texts)
+                    for analysis_types, group in reviews_by_types.items():
+                        try:
+                            analysis_results = self._classify_texts(
+                                [review.text for review in group],
+                                [review.score for review in group],
+                                list(analysis_types)
+                            )
+                        except LLMPartialResultError as e:
+                            completed = [
+                                (review, result) for review, result in zip(group, e.results)
+                                if result is not None
+                            ]
+                            stored.extend(self._store_analysis(
+                                session,
+                                [review for review, _ in completed],
+                                [result for _, result in completed],
+                                backfill
+                            ))
+                            raise e.error
+                        stored.extend(self._store_analysis(session, group, analysis_results, backfill))
                     
-                    # Обновить записи в БД
-                    for review, analysis in zip(unprocessed_reviews, analysis_results):
-                        review.review_category = analysis.review_category
-                        review.is_processed = True
+                    self._commit_analysis(session, stored, backfill)
+                    self.logger.info(f"Successfully analyzed {len(reviews)} reviews")
+                    return len(reviews)
+                
+                except LLMAPIError as e:
+                    # Разобранное до ошибки фиксируем: следующий запуск не отправит это в LLM снова
+                    if stored:
+                        self._commit_analysis(session, stored, backfill)
+                        self.logger.warning(f"Saved analysis of {len(stored)} reviews before LLM API error")
+                    else:
+                        session.rollback()
                     
-                    session.commit()
-                    self.logger.info(f"Successfully processed {len(unprocessed_reviews)} reviews")
-                    return len(unprocessed_reviews)
+                    if isinstance(e, LLMUnavailableError):
+                        # Апстрим нездоров: остальные отзывы остаются необработанными до следующего запуска
+                        self.logger.warning(f"Skipping LLM processing: {e}")
+                        self.run_stats["llm_unavailable"] = 1
+                        return len(stored)
                     
-                except LLMAPIError as e:
                     self.logger.error(f"LLM API error: {e}")
-                    session.rollback()
                     raise
                 except Exception as e:
                     self.logger.error(f"Unexpected error during LLM processing: {e}")
                     session.rollback()
                     raise DatabaseError(f"Failed to process reviews with LLM: {e}")
-                    
+        
         except DatabaseError:
             raise
         except Exception as e:
             self.logger.error(f"Database error while processing reviews: {e}")
             raise DatabaseError(f"Database error during review processing: {e}")
     
+    def _commit_analysis(self, session: Session, stored: List[MetricReview], backfill: bool) -> None:
+        """Зафиксировать записанный анализ и сбросить зависящие от него записи кэша."""
+        session.commit()
+        query_cache.invalidate_many({(review.store, review.app_type) for review in stored})
+        if not backfill and settings.metrics_mode == "aggregated":
+            # Каждый отзыв попадает в счетчики один раз - при фиксации классификации
+            metrics_aggregator.add_many(stored)
+    
+    def _analysis_version(self, analysis_type: str) -> int:
+        return settings.llm_analysis_versions.get(analysis_type, 1)
+    
+    def _missing_analysis_types(self, analysis: Dict[str, Any]) -> List[str]:
+        """Типы анализа из настроек, которых нет у отзыва или версия которых устарела."""
+        return [
+            analysis_type for analysis_type in settings.llm_analysis_types
+            if (analysis.get(analysis_type) or {}).get("version", 0)
+            < self._analysis_version(analysis_type)
+        ]
+    
+    def _missing_analysis_condition(self) -> ColumnElement:
+        """SQL условие для _missing_analysis_types."""
+        return or_(*(
+            or_(
+                not_(Review.analysis.has_key(analysis_type)),
+                Review.analysis[(analysis_type, "version")].as_integer()
+                < self._analysis_version(analysis_type)
+            )
+            for analysis_type in settings.llm_analysis_types
+        ))
+    
+    def _store_analysis(
+        self, 
+        session: Session, 
+        reviews: List[PendingReview], 
+        analysis_results: List[LLMAnalysisResult],
+        backfill: bool = False
+    ) -> List[MetricReview]:
+        """Записать результаты анализа одним UPDATE ... FROM unnest(...).
+        
+        Возвращает измененные отзывы: для инвалидации кэша и агрегированных метрик.
+        """
+        patches = [
+            {
+                analysis_type: {
+                    "value": value,
+                    "version": self._analysis_version(analysis_type),
+                    "source": result.source
+                }
+                for analysis_type, value in result.analysis.items()
+            }
+            for result in analysis_results
+        ]
+        
+        result = session.execute(STORE_ANALYSIS_STATEMENT, {
+            "ids": [review.id for review in reviews],
+            "hashes": [review.content_hash for review in reviews],
+            "categories": [result.review_category for result in analysis_results],
+            "patches": patches,
+            "updated_at": datetime.utcnow(),
+            "backfill": backfill
+        })
+        return [MetricReview(*row) for row in result]
+    
     def _send_metrics_for_processed_reviews(self) -> None:
+        """Отправить метрики для обработанных отзывов (один проход на все параллельные запросы)."""
+        singleflight.do(
+            "stage:send_metrics", self._send_metrics_for_processed_reviews_once,
+            remote_result=None, fresh=True
+        )
+    
+    def _send_metrics_for_processed_reviews_once(self) -> None:
         """Отправить метрики для обработанных отзывов."""
+        if settings.metrics_mode == "aggregated":
+            self._send_aggregated_metrics()
+            return
+        
         try:
-            with get_db_session() as session:
-                # Получить недавно обработанные отзывы
-                recent_processed = session.query(Review).filter(
-                    Review.is_processed == True,
-                    Review.updated_at >= datetime.utcnow().replace(hour=0, minute=0, second=0)
-                ).all()
-                
-                if not recent_processed:
-                    return
-                
-                self.logger.info(f"Sending metrics for {len(recent_processed)} processed reviews")
+            recent_processed = self._load_recent_processed_reviews()
+            
+            if not recent_processed:
+                return
+            
+            self.logger.info(f"Sending metrics for {len(recent_processed)} processed reviews")
+            
+            sent = 0
+            for processed_review in recent_processed:
+                try:
+                    self.metrics_service.send_review_metric(processed_review)
+                    sent += 1
                 
-                for review in recent_processed:
-                    try:
-                        processed_review = ProcessedReview(
-                            id=str(review.id),
-                            app_type=review.app_type,
-                            store=review.store,
-                            score=review.score,
-                            text=review.text,
-                            date=review.date,
-                            app_version=review.app_version,
-                            likes_count=review.likes_count,
-                            dislikes_count=review.dislikes_count,
-                            device_manufacturer=review.device_manufacturer,
-                            device_model=review.device_model,
-                            device_firmware=review.device_firmware,
-                            is_processed=review.is_processed,
-                            review_category=review.review_category
-                        )
-                        
-                        self.metrics_service.send_review_metric(processed_review)
-                        
-                    except Exception as e:
-                        self.logger.error(f"Error sending metrics for review {review.id}: {e}")
-                        continue
-                        
-        except Exception as e:
-            # Не прерываем процесс из-за ошибок метрик
-            self.logger.error(f"Error while sending metrics: {e}")_db(
-                        raw_reviews, app.app_type, store_info.type
-                    )
-                    total_new += new_count
-                    
                 except Exception as e:
-                    logger.error(f"Error fetching reviews for {app.package_name}: {e}")
+                    self.logger.error(f"Error sending metrics for review {processed_review.id}: {e}")
                     continue
+            
+            self._emit("metrics_flushed", sent_metrics=sent, failed_metrics=len(recent_processed) - sent)
         
-        return total_new
+        except Exception as e:
+            # Не прерываем процесс из-за ошибок метрик
+            self.logger.error(f"Error while sending metrics: {e}")
     
-    def _save_reviews_to_db(
-        self, 
-        raw_reviews: List[RawReviewData], 
-        app_type: str, 
-        store: str
-    ) -> int:
-        """Сохранить отзывы в БД."""
-        new_count = 0
-        
-        with get_db_session() as session:
-            for raw_review in raw_reviews:
-                try:
-                    # Проверить, существует ли отзыв
-                    existing = session.query(Review).filter(
-                        Review.store_review_id == raw_review.store_review_id
-                    ).first()
-                    
-                    if existing:
-                        continue
-                    
-                    # Создать новый отзыв
-                    review = Review(
-                        app_type=app_type,
-                        store=store,
-                        score=raw_review.rating,
-                        text=raw_review.text,
-                        date=max(raw_review.published_date, raw_review.written_date),
-                        app_version=raw_review.app_version,
-                        likes_count=raw_review.likes_count,
-                        dislikes_count=raw_review.dislikes_count,
-                        device_manufacturer=raw_review.device_manufacturer,
-                        device_model=raw_review.device_model,
-                        device_firmware=raw_review.device_firmware,
-                        store_review_id=raw_review.store_review_id,
-                        is_processed=False
-                    )
-                    
-                    session.add(review)
-                    new_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error saving review {raw_review.store_review_id}: {e}")
-                    continue
+    def _send_aggregated_metrics(self) -> None:
+        """Отправить приросты счетчиков, накопленные при классификации."""
+        try:
+            sent, failed, sent_reviews = self.metrics_service.send_aggregated_metrics(
+                metrics_aggregator
+            )
+            self._emit(
+                "metrics_flushed", 
+                sent_metrics=sent, 
+                failed_metrics=failed, 
+                aggregated_reviews=sent_reviews
+            )
         
-        logger.info(f"Saved {new_count} new reviews to database")
-        return new_count
+        except Exception as e:
+            # Не прерываем процесс из-за ошибок метрик
+            self.logger.error(f"Error while sending aggregated metrics: {e}")
     
-    def _process_unprocessed_reviews(self) -> int:
-        """Обработать необработанные отзывы через LLM."""
-        with get_db_session() as session:
-            unprocessed_reviews = session.query(Review).filter(
-                Review.is_processed == False
-            ).all()
-            
-            if not unprocessed_reviews:
-                logger.info("No unprocessed reviews found")
-                return 0
-            
-            logger.info(f"Processing {len(unprocessed_reviews)} unprocessed reviews")
-            
-            # Подготовить тексты для анализа
-            review_texts = [review.text for review in unprocessed_reviews]
-            
-            try:
-                # Анализировать батчем
-                analysis_results = self.llm_client.analyze_reviews_batch(review_texts)
-                
-                # Обновить записи в БД
-                for review, analysis in zip(unprocessed_reviews, analysis_results):
-                    review.review_category = analysis.review_category
-                    review.is_processed = True
-                
-                session.commit()
-                logger.info(f"Successfully processed {len(unprocessed_reviews)} reviews")
-                return len(unprocessed_reviews)
-                
-            except Exception as e:
-                logger.error(f"Error processing reviews with LLM: {e}")
-                session.rollback()
-                raise
+    def _load_recent_processed_reviews(self) -> List[MetricReview]:
+        """Загрузить недавно обработанные отзывы для отправки метрик."""
+        return self._load_processed_reviews(
+            Review.updated_at >= datetime.utcnow().replace(hour=0, minute=0, second=0)
+        )
     
-    def _send_metrics_for_processed_reviews(self) -> None:
-        """Отправить метрики для обработанных отзывов."""
+    def _load_processed_reviews(self, condition: ColumnElement) -> List[MetricReview]:
+        """Загрузить поля для метрик у обработанных отзывов, подходящих под условие."""
+        statement = select(*(getattr(Review, field) for field in MetricReview._fields)).where(
+            Review.is_processed == True,
+            condition
+        )
+        
         with get_db_session() as session:
-            # Получить недавно обработанные отзывы
-            recent_processed = session.query(Review).filter(
-                Review.is_processed == True,
-                Review.updated_at >= datetime.utcnow().replace(hour=0, minute=0, second=0)
-            ).all()
+            return [MetricReview(*row) for row in session.execute(statement)]
+    
+    def _classify_texts(
+        self, 
+        review_texts: List[str], 
+        review_scores: List[int],
+        analysis_types: List[str]
+    ) -> List[LLMAnalysisResult]:
+        """Классифицировать тексты: группировка почти-дубликатов, локальный предклассификатор, LLM."""
+        # Предклассификатор заменяет LLM, только если нужна одна категория
+        preclassifier = self.preclassifier if analysis_types == ["category"] else None
+        
+        if self.grouper:
+            groups = self.grouper.group(review_texts)
+        else:
+            groups = [[index] for index in range(len(review_texts))]
+        
+        group_results: List[Optional[LLMAnalysisResult]] = [None] * len(groups)
+        guesses: Dict[int, Tuple[Optional[str], float]] = {}
+        pending: List[int] = []
+        
+        for group_index, group in enumerate(groups):
+            representative = group[0]
             
-            if not recent_processed:
-                return
+            if preclassifier:
+                category, confidence = preclassifier.predict(
+                    review_texts[representative], review_scores[representative]
+                )
+                guesses[group_index] = (category, confidence)
+                
+                if category and preclassifier.is_confident(confidence):
+                    # Часть уверенных предсказаний перепроверяем через LLM
+                    if random.random() >= settings.preclassifier_shadow_rate:
+                        group_results[group_index] = LLMAnalysisResult(
+                            review_category=category,
+                            analysis={"category": category},
+                            source="preclassifier"
+                        )
+                        self.run_stats["preclassified_reviews"] += len(group)
+                        continue
+                    self.run_stats["preclassifier_shadow_checks"] += 1
+                elif category:
+                    self.run_stats["preclassifier_fallbacks"] += 1
             
-            logger.info(f"Sending metrics for {len(recent_processed)} processed reviews")
+            pending.append(group_index)
+        
+        if pending:
+            try:
+                llm_results = self.llm_client.analyze_reviews_batch(
+                    [review_texts[groups[group_index][0]] for group_index in pending],
+                    analysis_types
+                )
+            except LLMPartialResultError as e:
+                # Результаты разобранных батчей (и предклассификатора) раскладываем по отзывам
+                for group_index, result in zip(pending, e.results):
+                    group_results[group_index] = result
+                raise LLMPartialResultError(
+                    self._expand_group_results(groups, group_results, len(review_texts)), e.error
+                )
             
-            for review in recent_processed:
-                try:
-                    processed_review = ProcessedReview(
-                        id=str(review.id),
-                        app_type=review.app_type,
-                        store=review.store,
-                        score=review.score,
-                        text=review.text,
-                        date=review.date,
-                        app_version=review.app_version,
-                        likes_count=review.likes_count,
-                        dislikes_count=review.dislikes_count,
-                        device_manufacturer=review.device_manufacturer,
-                        device_model=review.device_model,
-                        device_firmware=review.device_firmware,
-                        is_processed=review.is_processed,
-                        review_category=review.review_category
+            for group_index, result in zip(pending, llm_results):
+                group_results[group_index] = result
+                
+                category, confidence = guesses.get(group_index, (None, 0.0))
+                if category:
+                    prefix = (
+                        "preclassifier_shadow"
+                        if preclassifier.is_confident(confidence)
+                        else "preclassifier_fallback"
                     )
-                    
-                    self.metrics_service.send_review_metric(processed_review)
-                    
-                except Exception as e:
-                    logger.error(f"Error sending metrics for review {review.id}: {e}")
-                    continue
\ No newline at end of file
+                    if category == result.review_category:
+                        self.run_stats[f"{prefix}_agreements"] += 1
+        
+        if len(pending) < len(review_texts):
+            self.logger.info(
+                f"Classified {len(review_texts)} reviews with {len(pending)} LLM classifications "
+                f"({len(groups)} near-duplicate groups, "
+                f"{self.run_stats['preclassified_reviews']} reviews classified locally)"
+            )
+        # Отзывы, получившие результат представителя своей группы; это не число запросов
+        # к LLM: в одном запросе батч из многих отзывов
+        self.run_stats["deduplicated_reviews"] += len(review_texts) - len(groups)
+        
+        return self._expand_group_results(groups, group_results, len(review_texts))
+    
+    def _expand_group_results(
+        self, 
+        groups: List[List[int]], 
+        group_results: List[Optional[LLMAnalysisResult]], 
+        size: int
+    ) -> List[Optional[LLMAnalysisResult]]:
+        """Результат группы - каждому отзыву группы."""
+        results: List[Optional[LLMAnalysisResult]] = [None] * size
+        for group, result in zip(groups, group_results):
+            for index in group:
+                results[index] = result
+        
+        return results
\ No newline at end of file
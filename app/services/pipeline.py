@@ -0,0 +1,368 @@
+import contextvars
+import queue
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+import logging
+
+from sqlalchemy import and_, any_, literal, select
+
+from app.core.config import settings
+from app.core.database import get_db_session
+from app.models.database import Review
+from app.models.requests import AppInfo, ReviewsRequest
+from app.clients.base import BaseStoreClient
+from app.services.observer import REVIEW_IDS_TYPE, ReviewObserver
+from app.services.singleflight import singleflight
+from app.utils.exceptions import (
+    ReviewServiceError, DatabaseError, StoreAPIError, LLMAPIError
+)
+
+
+_STOP = object()
+
+
+class _AppJob(NamedTuple):
+    """Приложение, отзывы которого проходят через конвейер."""
+    client: BaseStoreClient
+    store_type: str
+    store: str
+    app: AppInfo
+
+
+class PipelineStage:
+    """Этап конвейера: ограниченная очередь входа и пул рабочих потоков.
+    
+    handler получает элемент очереди и возвращает элементы для следующего этапа.
+    Когда очередь следующего этапа заполнена, рабочие блокируются на put, и
+    давление передается вверх по конвейеру.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Optional[Iterable[Any]]],
+        workers: int,
+        queue_size: int,
+        downstream: Optional["PipelineStage"] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.downstream = downstream
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.max_depth = 0
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+    
+    def start(self) -> None:
+        for index in range(self.workers):
+            # Каждый рабочий поток получает свою копию контекста вызывающего
+            thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._work,),
+                name=f"pipeline-{self.name}-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def put(self, item: Any) -> None:
+        """Поставить элемент в очередь; блокируется, пока в очереди нет места."""
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+    
+    def close(self) -> None:
+        """Дождаться обработки всех поставленных элементов и остановить рабочих."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+    
+    def _work(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            
+            try:
+                for result in self.handler(item) or ():
+                    self.downstream.put(result)
+            except Exception as e:
+                # Ошибки элементов обрабатываются в handler; сюда попадают только непредвиденные
+                self.logger.error(f"Pipeline stage '{self.name}' failed on item: {e}")
+
+
+class StagedReviewObserver(ReviewObserver):
+    """Обработка отзывов конвейером: fetch -> parse -> persist -> classify -> emit.
+    
+    Этапы работают одновременно: пока одни приложения скачиваются, отзывы уже
+    сохраненных классифицируются через LLM, а классифицированных - уходят в метрики.
+    Общее время стремится ко времени самого медленного этапа, а не к их сумме.
+    """
+    
+    def __init__(self, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._local = threading.local()
+        self._thread_stats: List[Counter] = []
+        self._stats_lock = threading.Lock()
+        self._failure: Optional[Exception] = None
+        self._llm_unavailable = False
+        super().__init__(on_progress=on_progress)
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    @property
+    def run_stats(self) -> Counter:
+        """Счетчики текущего потока; в конце запуска они складываются."""
+        stats = getattr(self._local, "run_stats", None)
+        if stats is None:
+            stats = self._local.run_stats = Counter()
+            with self._stats_lock:
+                self._thread_stats.append(stats)
+        return stats
+    
+    @run_stats.setter
+    def run_stats(self, value: Counter) -> None:
+        with self._stats_lock:
+            self._local = threading.local()
+            self._local.run_stats = value
+            self._thread_stats = [value]
+    
+    def process_reviews_request(self, request: ReviewsRequest) -> Dict[str, int]:
+        """Обработать запрос на получение отзывов."""
+        self.logger.info("Starting staged reviews processing")
+        
+        stats = {"new_reviews": 0, "processed_reviews": 0, "errors": 0}
+        self.run_stats = Counter()
+        self._failure = None
+        self._llm_unavailable = False
+        self._attach_llm_progress(self.llm_client)
+        started_at = datetime.utcnow()
+        
+        emit = PipelineStage(
+            "emit", self._emit_stage, settings.pipeline_emit_workers, settings.pipeline_queue_size
+        )
+        classify = PipelineStage(
+            "classify", self._classify_stage, settings.pipeline_classify_workers,
+            settings.pipeline_queue_size, emit
+        )
+        persist = PipelineStage(
+            "persist", self._persist_stage, settings.pipeline_persist_workers,
+            settings.pipeline_queue_size, classify
+        )
+        parse = PipelineStage(
+            "parse", self._parse_stage, settings.pipeline_parse_workers,
+            settings.pipeline_queue_size, persist
+        )
+        fetch = PipelineStage(
+            "fetch", self._fetch_stage, settings.pipeline_fetch_workers,
+            settings.pipeline_queue_size, parse
+        )
+        stages = [fetch, parse, persist, classify, emit]
+        
+        for stage in stages:
+            stage.start()
+        
+        reporting = threading.Event()
+        reporter = threading.Thread(
+            target=self._report_queue_depths, args=(stages, reporting),
+            name="pipeline-reporter", daemon=True
+        )
+        reporter.start()
+        
+        try:
+            try:
+                unsupported = self._enqueue_apps(request, fetch)
+                
+                # Отзывы, оставшиеся необработанными с прошлых запусков, идут сразу в классификацию
+                for review_ids in self._pending_review_batches(started_at):
+                    classify.put(review_ids)
+            finally:
+                # Этапы закрываются по порядку: каждый дорабатывает все, что поставил предыдущий
+                for stage in stages:
+                    stage.close()
+                reporting.set()
+                reporter.join()
+            
+            if self._failure:
+                raise self._failure
+            if not self._llm_unavailable:
+                self._backfill_missing_analysis()
+            if settings.metrics_mode == "aggregated":
+                self._send_metrics_for_processed_reviews()
+            
+            totals: Counter = Counter()
+            for stats_part in self._thread_stats:
+                totals.update(stats_part)
+            stats.update(totals)
+            for stage in stages:
+                stats[f"{stage.name}_queue_max_depth"] = stage.max_depth
+            
+            errors = unsupported + stats.pop("failed_apps", 0)
+            if errors > 0 and stats["new_reviews"] == 0:
+                raise ReviewServiceError(f"Failed to fetch any reviews, {errors} errors occurred")
+            
+            self.logger.info(f"Staged processing completed: {stats}")
+            return stats
+        
+        except (StoreAPIError, LLMAPIError, DatabaseError) as e:
+            self.logger.error(f"Service error during processing: {e}")
+            raise ReviewServiceError(f"Failed to process reviews: {e}")
+        except ReviewServiceError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error during processing: {e}")
+            raise ReviewServiceError(f"Unexpected error during processing: {e}")
+    
+    def _enqueue_apps(self, request: ReviewsRequest, fetch: PipelineStage) -> int:
+        """Поставить приложения из запроса в этап fetch; вернуть число неподдерживаемых сторов."""
+        unsupported = 0
+        
+        for store_info in request.stores:
+            store_type = store_info.type.lower()
+            
+            if store_type not in self.store_clients:
+                self.logger.warning(f"Unsupported store type: {store_type}")
+                unsupported += 1
+                continue
+            
+            client = self.store_clients[store_type]()
+            for app in store_info.apps:
+                fetch.put(_AppJob(client, store_type, store_info.type, app))
+        
+        return unsupported
+    
+    def _pending_review_batches(self, started_at: datetime) -> Iterable[List[uuid.UUID]]:
+        """Идентификаторы необработанных отзывов, сохраненных до начала запуска."""
+        statement = select(Review.id).where(
+            Review.is_processed == False,
+            Review.updated_at < started_at
+        )
+        
+        with get_db_session() as session:
+            review_ids = session.execute(statement).scalars().all()
+        
+        for start in range(0, len(review_ids), settings.llm_max_batch_size):
+            yield review_ids[start:start + settings.llm_max_batch_size]
+    
+    def _fetch_stage(self, job: _AppJob) -> Iterable[Any]:
+        """Скачать отзывы приложения."""
+        if self._failure:
+            return
+        
+        try:
+            raw_reviews = singleflight.do(
+                f"fetch:{job.store_type}:{job.app.package_name}",
+                lambda: job.client.fetch_raw_reviews(job.app.package_name),
+                remote_result=None
+            )
+        except Exception as e:
+            self._app_failed(job, e)
+            return
+        
+        if raw_reviews is None:
+            # Отзывы приложения уже загружены другой репликой
+            self._emit_app_fetched(job.store, job.app, 0, 0, 0)
+            return
+        
+        yield job, raw_reviews
+    
+    def _parse_stage(self, item: Any) -> Iterable[Any]:
+        """Разобрать ответ стора."""
+        job, raw_reviews = item
+        
+        try:
+            reviews = job.client.parse_raw_reviews(raw_reviews)
+        except Exception as e:
+            self._app_failed(job, e)
+            return
+        
+        yield job, reviews
+    
+    def _persist_stage(self, item: Any) -> Iterable[Any]:
+        """Сохранить отзывы и передать новые и измененные в классификацию."""
+        job, reviews = item
+        
+        try:
+            written = self._upsert_reviews(reviews, job.app.app_type, job.store)
+        except Exception as e:
+            self._app_failed(job, e)
+            return
+        
+        new_count = sum(1 for _, inserted in written if inserted)
+        self.run_stats["new_reviews"] += new_count
+        self._emit_app_fetched(job.store, job.app, len(reviews), new_count, len(written) - new_count)
+        
+        review_ids = [review_id for review_id, _ in written]
+        for start in range(0, len(review_ids), settings.llm_max_batch_size):
+            yield review_ids[start:start + settings.llm_max_batch_size]
+    
+    def _classify_stage(self, review_ids: List[uuid.UUID]) -> Iterable[Any]:
+        """Классифицировать отзывы и передать обработанные в метрики."""
+        if self._failure or self._llm_unavailable:
+            return
+        
+        try:
+            processed_count = self._analyze_reviews(and_(
+                Review.id == any_(literal(review_ids, REVIEW_IDS_TYPE)),
+                Review.is_processed == False
+            ))
+        except Exception as e:
+            self.logger.error(f"Classification stage failed: {e}")
+            self._failure = self._failure or e
+            return
+        
+        if self.run_stats["llm_unavailable"]:
+            # Остальные батчи не отправляем: предохранитель LLM разомкнут
+            self._llm_unavailable = True
+        
+        self.run_stats["processed_reviews"] += processed_count
+        self._emit("reviews_processed", processed_reviews=processed_count)
+        
+        if processed_count:
+            yield review_ids
+    
+    def _emit_stage(self, review_ids: List[uuid.UUID]) -> None:
+        """Отправить метрики по классифицированным отзывам."""
+        if settings.metrics_mode == "aggregated":
+            # Отзывы уже учтены в счетчиках при классификации, приросты уходят в конце запуска
+            return
+        
+        try:
+            processed_reviews = self._load_processed_reviews(
+                Review.id == any_(literal(review_ids, REVIEW_IDS_TYPE))
+            )
+        except Exception as e:
+            # Не прерываем процесс из-за ошибок метрик
+            self.logger.error(f"Error while loading reviews for metrics: {e}")
+            return
+        
+        sent = 0
+        for processed_review in processed_reviews:
+            try:
+                self.metrics_service.send_review_metric(processed_review)
+                sent += 1
+            except Exception as e:
+                self.logger.error(f"Error sending metrics for review {processed_review.id}: {e}")
+        
+        self._emit("metrics_flushed", sent_metrics=sent, failed_metrics=len(processed_reviews) - sent)
+    
+    def _app_failed(self, job: _AppJob, error: Exception) -> None:
+        self.logger.error(f"Error fetching reviews for {job.app.package_name}: {error}")
+        self.run_stats["failed_apps"] += 1
+        self._emit_app_failed(job.store, job.app, error)
+    
+    def _report_queue_depths(self, stages: List[PipelineStage], stopped: threading.Event) -> None:
+        """Периодически сообщать глубину очередей этапов."""
+        while not stopped.wait(settings.pipeline_report_interval):
+            depths = {stage.name: stage.depth for stage in stages}
+            self.logger.debug(f"Pipeline queue depths: {depths}")
+            self._emit("pipeline_queues", depths=depths)
\ No newline at end of file
@@ -0,0 +1,226 @@
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.services.dedup import normalize_text
+
+
+# Очевидные баги: падения, зависания, "не работает"
+_BUG_RE = re.compile(
+    r"\b(вылета\w*|крашит\w*|краш\w*|зависа\w*|глюч\w*|баг\w*|"
+    r"не (работает|открывается|запускается|загружается|грузится|входит))\b"
+)
+_NEGATED_BUG_RE = re.compile(r"\bне (вылета|крашит|зависа|глюч)\w*")
+
+# Короткие благодарности без содержательных претензий
+_PRAISE_WORDS = {
+    "спасибо", "отлично", "отличное", "супер", "класс", "классное", "круто",
+    "удобно", "удобное", "лучшее", "лучший", "хорошее", "хорошо", "нравится", "топ",
+}
+_FILLER_WORDS = {"приложение", "очень", "все", "всем", "за", "просто", "вам", "банк", "и"}
+_PRAISE_MAX_WORDS = 6
+
+
+def _tokens(text: str, score: int) -> List[str]:
+    """Признаки отзыва: слова, биграммы слов и оценка."""
+    words = normalize_text(text).split()
+    tokens = list(words)
+    tokens.extend(f"{left} {right}" for left, right in zip(words, words[1:]))
+    tokens.append(f"score:{score}")
+    return tokens
+
+
+class HashedNaiveBayes:
+    """Мультиномиальный наивный байес над хешированными n-граммами."""
+    
+    def __init__(self, n_features: int = 2 ** 18, alpha: float = 1.0):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.class_counts: Dict[str, int] = {}
+        self.feature_counts: Dict[str, Dict[int, int]] = {}
+        self.feature_totals: Dict[str, int] = {}
+        self.vocabulary_size = 0
+    
+    def _hash(self, token: str) -> int:
+        return zlib.crc32(token.encode("utf-8")) % self.n_features
+    
+    def fit(self, samples: Iterable[Tuple[str, int, str]]) -> "HashedNaiveBayes":
+        """Обучить модель на тройках (текст, оценка, категория)."""
+        vocabulary = set()
+        for text, score, category in samples:
+            self.class_counts[category] = self.class_counts.get(category, 0) + 1
+            counts = self.feature_counts.setdefault(category, {})
+            for token in _tokens(text, score):
+                bucket = self._hash(token)
+                counts[bucket] = counts.get(bucket, 0) + 1
+                self.feature_totals[category] = self.feature_totals.get(category, 0) + 1
+                vocabulary.add(bucket)
+        
+        self.vocabulary_size = len(vocabulary)
+        return self
+    
+    def predict_proba(self, text: str, score: int) -> Dict[str, float]:
+        """Вероятности категорий для отзыва."""
+        if not self.class_counts:
+            return {}
+        
+        buckets = Counter(self._hash(token) for token in _tokens(text, score))
+        total_samples = sum(self.class_counts.values())
+        log_probs = {}
+        
+        for category, class_count in self.class_counts.items():
+            counts = self.feature_counts.get(category, {})
+            denominator = self.feature_totals.get(category, 0) + self.alpha * self.vocabulary_size
+            log_prob = math.log(class_count / total_samples)
+            for bucket, occurrences in buckets.items():
+                log_prob += occurrences * math.log(
+                    (counts.get(bucket, 0) + self.alpha) / denominator
+                )
+            log_probs[category] = log_prob
+        
+        max_log_prob = max(log_probs.values())
+        exp_probs = {
+            category: math.exp(log_prob - max_log_prob)
+            for category, log_prob in log_probs.items()
+        }
+        norm = sum(exp_probs.values())
+        return {category: value / norm for category, value in exp_probs.items()}
+    
+    def to_dict(self) -> Dict:
+        return {
+            "n_features": self.n_features,
+            "alpha": self.alpha,
+            "class_counts": self.class_counts,
+            "feature_counts": {
+                category: {str(bucket): count for bucket, count in counts.items()}
+                for category, counts in self.feature_counts.items()
+            },
+            "feature_totals": self.feature_totals,
+            "vocabulary_size": self.vocabulary_size,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HashedNaiveBayes":
+        model = cls(n_features=data["n_features"], alpha=data["alpha"])
+        model.class_counts = data["class_counts"]
+        model.feature_counts = {
+            category: {int(bucket): count for bucket, count in counts.items()}
+            for category, counts in data["feature_counts"].items()
+        }
+        model.feature_totals = data["feature_totals"]
+        model.vocabulary_size = data["vocabulary_size"]
+        return model
+    
+    def save(self, path: str) -> None:
+        """Сохранить модель в JSON файл."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as model_file:
+            json.dump(self.to_dict(), model_file)
+    
+    @classmethod
+    def load(cls, path: str) -> "HashedNaiveBayes":
+        """Загрузить модель из JSON файла."""
+        with open(path, encoding="utf-8") as model_file:
+            return cls.from_dict(json.load(model_file))
+
+
+@lru_cache(maxsize=4)
+def _load_model(path: str, mtime: float) -> HashedNaiveBayes:
+    """Загрузить модель один раз на процесс (перечитывается при изменении файла)."""
+    return HashedNaiveBayes.load(path)
+
+
+class PreClassifier:
+    """Локальный предклассификатор: правила по ключевым словам и наивный байес."""
+    
+    def __init__(self, model_path: Optional[str] = None, threshold: Optional[float] = None):
+        self.model_path = model_path if model_path is not None else settings.preclassifier_model_path
+        self.threshold = (
+            settings.preclassifier_confidence_threshold if threshold is None else threshold
+        )
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+        self.model = self._load()
+    
+    def _load(self) -> Optional[HashedNaiveBayes]:
+        """Загрузить обученную модель, если она есть."""
+        if not self.model_path:
+            return None
+        try:
+            return _load_model(self.model_path, os.path.getmtime(self.model_path))
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Pre-classifier model not loaded, using rules only: {e}")
+            return None
+    
+    def predict(self, text: str, score: int) -> Tuple[Optional[str], float]:
+        """Предсказать категорию и уверенность; (None, 0.0) если предсказания нет."""
+        rule_result = self._apply_rules(text, score)
+        if rule_result:
+            return rule_result
+        
+        if not self.model:
+            return None, 0.0
+        
+        probabilities = self.model.predict_proba(text, score)
+        if not probabilities:
+            return None, 0.0
+        
+        category = max(probabilities, key=probabilities.get)
+        return category, probabilities[category]
+    
+    def is_confident(self, confidence: float) -> bool:
+        """Достаточно ли уверенности, чтобы не обращаться к LLM."""
+        return confidence >= self.threshold
+    
+    def _apply_rules(self, text: str, score: int) -> Optional[Tuple[str, float]]:
+        """Правила для очевидных случаев."""
+        normalized = normalize_text(text)
+        words = normalized.split()
+        
+        if score <= 3 and _BUG_RE.search(normalized) and not _NEGATED_BUG_RE.search(normalized):
+            return "bug", 0.99
+        
+        if (
+            score >= 4
+            and 0 < len(words) <= _PRAISE_MAX_WORDS
+            and any(word in _PRAISE_WORDS for word in words)
+            and all(word in _PRAISE_WORDS or word in _FILLER_WORDS for word in words)
+        ):
+            return "other", 0.99
+        
+        return None
+
+
+def train_from_database(limit: Optional[int] = None) -> HashedNaiveBayes:
+    """Обучить модель на отзывах, уже размеченных LLM."""
+    from app.core.database import get_db_session
+    from app.models.database import Review
+    
+    logger = logging.getLogger(f'{__name__}.train_from_database')
+    
+    with get_db_session() as session:
+        query = session.query(Review.text, Review.score, Review.review_category).filter(
+            Review.is_processed == True,
+            Review.review_category.isnot(None),
+            # Только метки LLM: собственные предсказания модели не должны попадать в обучение
+            Review.analysis[("category", "source")].astext == "llm",
+            # У архивных отзывов текст пуст: они только сместили бы априорные частоты классов
+            Review.is_archived == False
+        ).order_by(Review.date.desc())
+        if limit:
+            query = query.limit(limit)
+        
+        model = HashedNaiveBayes().fit(
+            (text, score, category) for text, score, category in query.yield_per(5000)
+        )
+    
+    logger.info(f"Trained pre-classifier on {sum(model.class_counts.values())} reviews: {model.class_counts}")
+    return model
\ No newline at end of file
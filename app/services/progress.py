@@ -0,0 +1,56 @@
+import contextvars
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator
+import logging
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+_DONE = object()
+
+
+def stream_progress(
+    run: Callable[[ProgressCallback], Dict[str, Any]], 
+    heartbeat_interval: float
+) -> Iterator[str]:
+    """Выполнить run в фоновом потоке и отдавать события прогресса строками NDJSON.
+    
+    Пока событий нет, раз в heartbeat_interval секунд отдается heartbeat,
+    чтобы прокси не закрывали долгий запрос по таймауту простоя.
+    """
+    logger = logging.getLogger(f'{__name__}.stream_progress')
+    events: "queue.Queue[Any]" = queue.Queue()
+    
+    def worker() -> None:
+        try:
+            stats = run(events.put)
+            events.put({"event": "completed", "stats": stats})
+        except Exception as e:
+            logger.error(f"Streamed processing failed: {e}")
+            events.put({"event": "error", "error": e.__class__.__name__, "message": str(e)})
+        finally:
+            events.put(_DONE)
+    
+    # Поток наследует контекст запроса (учет SQL и т.п.)
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(worker,), name="progress-stream", daemon=True
+    ).start()
+    yield _to_line({"event": "started"})
+    
+    while True:
+        try:
+            event = events.get(timeout=heartbeat_interval)
+        except queue.Empty:
+            yield _to_line({"event": "heartbeat"})
+            continue
+        
+        if event is _DONE:
+            break
+        yield _to_line(event)
+
+
+def _to_line(event: Dict[str, Any]) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str) + "\n"
\ No newline at end of file
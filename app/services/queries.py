@@ -0,0 +1,20 @@
+from sqlalchemy import Select
+
+from app.models.database import Review
+from app.models.requests import ReviewsFilter
+
+
+def apply_review_filters(statement: Select, filters: ReviewsFilter) -> Select:
+    """Применить фильтры к запросу по таблице отзывов."""
+    if filters.store:
+        statement = statement.where(Review.store == filters.store)
+    if filters.app_type:
+        statement = statement.where(Review.app_type == filters.app_type)
+    if filters.category:
+        statement = statement.where(Review.review_category == filters.category)
+    if filters.date_from:
+        statement = statement.where(Review.date >= filters.date_from)
+    if filters.date_to:
+        statement = statement.where(Review.date <= filters.date_to)
+    
+    return statement
\ No newline at end of file
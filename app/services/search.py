@@ -0,0 +1,122 @@
+import uuid
+from typing import Any, Dict, List, Optional
+import logging
+
+from sqlalchemy import Text, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db_session
+from app.models.database import Review
+from app.models.requests import SearchRequest
+from app.services.archive import load_archived_texts
+from app.services.cache import query_cache
+from app.services.queries import apply_review_filters
+
+
+# Должна совпадать с конфигурацией в триггере колонки reviews.text_search
+TEXT_SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+REVIEW_IDS_TYPE = ARRAY(UUID(as_uuid=True))
+
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+# websearch: "фраза в кавычках", or, -исключение; phrase: слова подряд; plain: все слова
+_QUERY_PARSERS = {
+    "websearch": func.websearch_to_tsquery,
+    "phrase": func.phraseto_tsquery,
+    "plain": func.plainto_tsquery,
+}
+
+
+class ReviewSearchService:
+    """Полнотекстовый поиск по отзывам через GIN индекс по tsvector."""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    def search(self, search_request: SearchRequest) -> Dict[str, Any]:
+        """Найти отзывы, отсортированные по релевантности."""
+        return query_cache.get_or_load(
+            "search", search_request.dict(), (search_request.store, search_request.app_type),
+            lambda: self._search(search_request)
+        )
+    
+    def _search(self, search_request: SearchRequest) -> Dict[str, Any]:
+        query = _QUERY_PARSERS[search_request.mode](TEXT_SEARCH_CONFIG, search_request.q)
+        rank = func.ts_rank_cd(Review.text_search, query).label("rank")
+        
+        # Сначала отбираем страницу по индексу и рангу, подсветку считаем только для нее
+        matches = apply_review_filters(
+            select(Review.id, rank).where(Review.text_search.op("@@")(query)),
+            search_request
+        ).order_by(rank.desc(), Review.date.desc()).limit(
+            search_request.limit + 1
+        ).offset(search_request.offset).subquery()
+        
+        columns = [
+            Review.id,
+            Review.store,
+            Review.app_type,
+            Review.score,
+            Review.date,
+            Review.app_version,
+            Review.review_category,
+            Review.is_archived,
+            matches.c.rank,
+        ]
+        if search_request.highlight:
+            columns.append(
+                func.ts_headline(TEXT_SEARCH_CONFIG, Review.text, query, HEADLINE_OPTIONS).label("highlight")
+            )
+        else:
+            columns.append(Review.text)
+        
+        statement = select(*columns).join(matches, matches.c.id == Review.id).order_by(
+            matches.c.rank.desc(), Review.date.desc()
+        )
+        
+        with get_db_session() as session:
+            rows = session.execute(statement).all()
+            has_more = len(rows) > search_request.limit
+            rows = rows[:search_request.limit]
+            archived = self._archived_fields(
+                session, [row.id for row in rows if row.is_archived], query, search_request.highlight
+            )
+        
+        results = [self._serialize(row, archived.get(row.id)) for row in rows]
+        
+        self.logger.info(f"Search '{search_request.q}' returned {len(results)} reviews")
+        return {"results": results, "has_more": has_more}
+    
+    def _archived_fields(
+        self, 
+        session: Session, 
+        review_ids: List[uuid.UUID], 
+        query, 
+        highlight: bool
+    ) -> Dict[uuid.UUID, Dict[str, str]]:
+        """Текст или подсветка для архивных отзывов страницы: text у них пуст."""
+        texts = load_archived_texts(session, review_ids)
+        if not texts or not highlight:
+            return {review_id: {"text": text} for review_id, text in texts.items()}
+        
+        archived = select(
+            func.unnest(literal(list(texts), REVIEW_IDS_TYPE)).label("id"),
+            func.unnest(literal(list(texts.values()), ARRAY(Text))).label("text")
+        ).subquery()
+        headlines = session.execute(select(
+            archived.c.id,
+            func.ts_headline(TEXT_SEARCH_CONFIG, archived.c.text, query, HEADLINE_OPTIONS)
+        ))
+        return {review_id: {"highlight": headline} for review_id, headline in headlines}
+    
+    def _serialize(self, row, archived: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        data = dict(row._mapping)
+        del data["is_archived"]
+        if archived:
+            data.update(archived)
+        data["id"] = str(data["id"])
+        data["date"] = data["date"].isoformat()
+        data["rank"] = float(data["rank"])
+        return data
\ No newline at end of file
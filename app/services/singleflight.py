@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.database import get_engine, pinned_connection
+
+
+T = TypeVar("T")
+
+# SQLSTATE lock_not_available: ожидание блокировки прервано по lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+# Состояния вызывающего в _begin
+_LEADER = "leader"
+_JOINED = "joined"
+_STALE = "stale"
+
+
+def advisory_lock_id(key: str) -> int:
+    """Стабильный знаковый 64-битный идентификатор advisory lock для ключа."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class AdvisoryLock:
+    """Сессионный advisory lock Postgres.
+    
+    Работа под блокировкой выполняется на том же соединении (pinned_connection),
+    так что вызов занимает одно соединение пула, а не два.
+    """
+    
+    def __init__(self, key: str):
+        self.key = key
+        self.lock_id = advisory_lock_id(key)
+        self._connection: Optional[Connection] = None
+    
+    @property
+    def connection(self) -> Optional[Connection]:
+        return self._connection
+    
+    def acquire(self) -> Optional[bool]:
+        """Взять блокировку.
+        
+        True - взята сразу, False - пришлось ждать другую реплику, None - не дождались
+        за coalescing_lock_timeout: блокировка не взята, соединение возвращено в пул.
+        """
+        self._connection = get_engine().connect()
+        try:
+            acquired = self._connection.execute(
+                text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": self.lock_id}
+            ).scalar()
+            if not acquired:
+                # lock_timeout ограничивает и ожидание advisory lock; is_local - до конца транзакции
+                self._connection.execute(
+                    text("SELECT set_config('lock_timeout', :timeout, true)"),
+                    {"timeout": f"{int(settings.coalescing_lock_timeout * 1000)}ms"}
+                )
+                try:
+                    self._connection.execute(
+                        text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": self.lock_id}
+                    )
+                except OperationalError as e:
+                    if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE:
+                        raise
+                    self._close()
+                    return None
+            
+            # Сессионная блокировка переживает коммит, а соединение остается свободным
+            # от транзакции: сессии работы на нем коммитятся сами
+            self._connection.commit()
+            return bool(acquired)
+        except Exception:
+            self._close()
+            raise
+    
+    def release(self) -> None:
+        """Отпустить блокировку и вернуть соединение в пул."""
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(
+                text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": self.lock_id}
+            )
+            self._connection.commit()
+        finally:
+            self._close()
+    
+    def _close(self) -> None:
+        self._connection.close()
+        self._connection = None
+
+
+class SingleFlight:
+    """Схлопывание одинаковой работы: пока вызов по ключу выполняется, остальные ждут его результат.
+    
+    Внутри процесса вызовы объединяются через общий Future, между репликами -
+    через advisory lock Postgres: реплика, дождавшаяся чужой блокировки, не повторяет
+    работу, а возвращает remote_result.
+    
+    С fresh=True вызывающий присоединяется только к вызову, начатому после него, - когда
+    работа должна учесть данные, которые он только что записал. Более ранний вызов
+    дожидается завершения, после чего работа выполняется заново (один раз на всех
+    ожидавших); дождавшись чужой реплики, такой вызов тоже выполняет работу сам.
+    
+    Работа под блокировкой идет на соединении блокировки и не должна обращаться
+    к БД из нескольких потоков или задач одновременно.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, Tuple[Future, float]] = {}
+        self._joined: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+    
+    def do(self, key: str, func: Callable[[], T], remote_result: T, fresh: bool = False) -> T:
+        """Выполнить func по ключу или присоединиться к уже выполняющемуся вызову."""
+        if not settings.coalescing_enabled:
+            return func()
+        
+        arrived_at = time.monotonic()
+        while True:
+            future, role = self._begin(key, arrived_at if fresh else None)
+            if role == _JOINED:
+                return future.result()
+            if role == _LEADER:
+                break
+            wait([future])
+        
+        try:
+            result = self._call(key, func, remote_result, fresh)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        
+        self._finish(key, future, result=result)
+        return result
+    
+    async def do_async(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[T]],
+        remote_result: T,
+        fresh: bool = False
+    ) -> T:
+        """Асинхронный вариант do: ожидание чужого вызова не занимает поток."""
+        if not settings.coalescing_enabled:
+            return await factory()
+        
+        arrived_at = time.monotonic()
+        while True:
+            future, role = self._begin(key, arrived_at if fresh else None)
+            if role == _JOINED:
+                return await asyncio.wrap_future(future)
+            if role == _LEADER:
+                break
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                # Ошибка раннего вызова достается его участникам, этот вызов просто повторит работу
+                pass
+        
+        try:
+            result = await self._call_async(key, factory, remote_result, fresh)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        
+        self._finish(key, future, result=result)
+        return result
+    
+    def _call(self, key: str, func: Callable[[], T], remote_result: T, fresh: bool) -> T:
+        if not settings.coalescing_advisory_locks:
+            return func()
+        
+        lock = AdvisoryLock(key)
+        acquired = lock.acquire()
+        if acquired is None:
+            self._lock_timed_out(key)
+            return func()
+        
+        try:
+            if not acquired and not fresh:
+                return self._remote(key, remote_result)
+            with pinned_connection(lock.connection):
+                return func()
+        finally:
+            lock.release()
+    
+    async def _call_async(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[T]],
+        remote_result: T,
+        fresh: bool
+    ) -> T:
+        if not settings.coalescing_advisory_locks:
+            return await factory()
+        
+        lock = AdvisoryLock(key)
+        acquired = await asyncio.to_thread(lock.acquire)
+        if acquired is None:
+            self._lock_timed_out(key)
+            return await factory()
+        
+        try:
+            if not acquired and not fresh:
+                return self._remote(key, remote_result)
+            with pinned_connection(lock.connection):
+                return await factory()
+        finally:
+            await asyncio.to_thread(lock.release)
+    
+    def _begin(self, key: str, started_after: Optional[float]) -> Tuple[Future, str]:
+        """Зарегистрировать вызов; вернуть Future и роль вызывающего.
+        
+        _STALE - идет вызов, начатый раньше started_after: его нужно дождаться и повторить.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                future, started_at = call
+                if started_after is not None and started_at < started_after:
+                    self.logger.info(f"In-flight call '{key}' started earlier, will run again after it")
+                    return future, _STALE
+                
+                self._joined[key] += 1
+                self.logger.info(f"Joining in-flight call '{key}'")
+                return future, _JOINED
+            
+            future = Future()
+            self._calls[key] = (future, time.monotonic())
+            self._joined[key] = 0
+            return future, _LEADER
+    
+    def _finish(
+        self,
+        key: str,
+        future: Future,
+        result: Any = None,
+        error: Optional[BaseException] = None
+    ) -> None:
+        with self._lock:
+            del self._calls[key]
+            joined = self._joined.pop(key)
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        
+        if joined:
+            self.logger.info(f"Call '{key}' shared with {joined} waiting callers")
+    
+    def _remote(self, key: str, remote_result: T) -> T:
+        self.logger.info(f"Call '{key}' was completed by another replica")
+        return remote_result
+    
+    def _lock_timed_out(self, key: str) -> None:
+        # Повтор работы безопасен (upsert и классификация идемпотентны), зависание - нет
+        self.logger.warning(
+            f"Timed out waiting for another replica's lock on '{key}', running without it"
+        )
+
+
+# Общий для процесса экземпляр
+singleflight = SingleFlight()
\ No newline at end of file
@@ -8,7 +8,8 @@ from app.utils.exceptions import (
     StoreAPIError, 
     LLMAPIError, 
     MetricsAPIError, 
-    DatabaseError
+    DatabaseError,
+    ExportError
 )
 
 
@@ -63,6 +64,15 @@ def register_error_handlers(app: Flask) -> None:
             "message": "A database error occurred"
         }), 500
     
+    @app.errorhandler(ExportError)
+    def handle_export_error(error: ExportError):
+        """Обработка ошибок выгрузки отзывов."""
+        logger.warning(f"Export error for {request.url}: {error}")
+        return jsonify({
+            "error": "Export error",
+            "message": str(error)
+        }), 400
+    
     @app.errorhandler(SQLAlchemyError)
     def handle_sqlalchemy_error(error: SQLAlchemyError):
         """Обработка ошибок SQLAlchemy."""
@@ -13,6 +13,24 @@ class LLMAPIError(ReviewServiceError):
     pass
 
 
+class LLMUnavailableError(LLMAPIError):
+    """LLM API временно недоступен (предохранитель разомкнут)."""
+    pass
+
+
+class LLMPartialResultError(LLMAPIError):
+    """Часть батчей разобрана до ошибки LLM API.
+    
+    results - результаты по отзывам в исходном порядке, None для неразобранных;
+    error - исходная ошибка упавшего батча.
+    """
+    
+    def __init__(self, results, error):
+        super().__init__(str(error))
+        self.results = results
+        self.error = error
+
+
 class MetricsAPIError(ReviewServiceError):
     """Ошибка при отправке метрик."""
     pass
@@ -20,4 +38,9 @@ class MetricsAPIError(ReviewServiceError):
 
 class DatabaseError(ReviewServiceError):
     """Ошибка при работе с базой данных."""
+    pass
+
+
+class ExportError(ReviewServiceError):
+    """Ошибка при выгрузке отзывов."""
     pass
\ No newline at end of file
@@ -0,0 +1,179 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+class SQLStats:
+    """Счетчики SQL запросов в рамках одного HTTP запроса."""
+    
+    def __init__(self):
+        self.statements = 0
+        self.total_time = 0.0
+        self.counts: Counter = Counter()
+        self.times: Counter = Counter()
+        self._lock = threading.Lock()
+    
+    def record(self, statement: str, duration: float) -> None:
+        # Запросы идут и из рабочих потоков конвейера, и из event loop
+        with self._lock:
+            self.statements += 1
+            self.total_time += duration
+            self.counts[statement] += 1
+            self.times[statement] += duration
+    
+    def repeated(self, threshold: int) -> List[Dict[str, Any]]:
+        """Одинаковые запросы, выполненные не меньше threshold раз (вероятные N+1)."""
+        with self._lock:
+            return [
+                {
+                    "statement": statement[:500],
+                    "count": count,
+                    "total_ms": round(self.times[statement] * 1000, 2)
+                }
+                for statement, count in self.counts.most_common()
+                if count >= threshold
+            ]
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "statements": self.statements,
+            "db_time_ms": round(self.total_time * 1000, 2),
+            "repeated_statements": self.repeated(settings.sql_repeated_statement_threshold)
+        }
+
+
+# Учет SQL текущего запроса; наследуется задачами asyncio, asyncio.to_thread
+# и потоками, запущенными через contextvars.copy_context()
+_current_sql_stats: ContextVar[Optional[SQLStats]] = ContextVar("sql_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Время начала хранится в контексте выполнения: упавший запрос ничего не оставляет
+    # на соединении, и время следующих запросов не сбивается
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_query_start", None)
+    sql_stats = _current_sql_stats.get()
+    if sql_stats is not None and started is not None:
+        sql_stats.record(statement, time.perf_counter() - started)
+
+
+def register_profiling(app: Flask) -> None:
+    """Регистрация учета SQL и профилирования запросов по заголовку или выборке."""
+    logger = logging.getLogger('review_service.profiling')
+    
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    
+    if settings.profiling_enabled and not settings.profiling_token:
+        logger.warning("PROFILING_ENABLED is set without PROFILING_TOKEN, header profiling is disabled")
+    
+    def should_profile() -> bool:
+        header_value = request.headers.get(settings.profiling_header)
+        if header_value and settings.profiling_enabled and settings.profiling_token:
+            # Профилировать по заголовку может только тот, кто знает токен
+            return header_value == settings.profiling_token
+        return random.random() < settings.profiling_sample_rate
+    
+    @app.before_request
+    def start_request_profiling():
+        g.sql_stats = SQLStats()
+        _current_sql_stats.set(g.sql_stats)
+        g.profiler = None
+        
+        if should_profile():
+            g.profile_id = uuid.uuid4().hex[:12]
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+    
+    @app.after_request
+    def finish_request_profiling(response: Response) -> Response:
+        if "sql_stats" not in g:
+            return response
+        
+        sql_stats = g.sql_stats
+        profiler = g.profiler
+        profile_id = g.get("profile_id")
+        endpoint = request.endpoint or "unknown"
+        
+        def finish() -> None:
+            _current_sql_stats.set(None)
+            if profiler is not None:
+                profiler.disable()
+            _report(logger, endpoint, sql_stats, profiler, profile_id)
+        
+        if profiler is not None:
+            response.headers["X-Profile-Id"] = profile_id
+        
+        if response.is_streamed:
+            # Тело потокового ответа формируется уже после after_request
+            response.call_on_close(finish)
+        else:
+            response.headers["X-SQL-Count"] = str(sql_stats.statements)
+            response.headers["X-SQL-Time-Ms"] = f"{sql_stats.total_time * 1000:.2f}"
+            finish()
+        
+        return response
+
+
+def _report(
+    logger: logging.Logger,
+    endpoint: str,
+    sql_stats: SQLStats,
+    profiler: Optional[cProfile.Profile],
+    profile_id: Optional[str]
+) -> None:
+    """Записать в лог учет SQL и сохранить профиль запроса, если он снимался."""
+    summary = sql_stats.summary()
+    
+    for repeated in summary["repeated_statements"]:
+        logger.warning(
+            f"Possible N+1 in {endpoint}: statement executed {repeated['count']} times "
+            f"({repeated['total_ms']} ms): {repeated['statement'][:200]}"
+        )
+    logger.debug(
+        f"{endpoint}: {summary['statements']} SQL statements, {summary['db_time_ms']} ms in DB"
+    )
+    
+    if profiler is None:
+        return
+    
+    try:
+        os.makedirs(settings.profiling_output_dir, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{endpoint.replace('.', '_')}-{profile_id}"
+        path = os.path.join(settings.profiling_output_dir, name)
+        
+        # .prof открывается в snakeviz/pstats, .txt - сводка для быстрого просмотра
+        profiler.dump_stats(f"{path}.prof")
+        
+        text_report = io.StringIO()
+        pstats.Stats(profiler, stream=text_report).sort_stats("cumulative").print_stats(50)
+        with open(f"{path}.txt", "w", encoding="utf-8") as report_file:
+            report_file.write(f"endpoint: {endpoint}\n")
+            report_file.write(f"sql: {summary}\n\n")
+            report_file.write(text_report.getvalue())
+        
+        logger.info(f"Saved profile {profile_id} for {endpoint} to {path}.prof")
+    
+    except OSError as e:
+        logger.error(f"Failed to save profile {profile_id}: {e}")
\ No newline at end of file
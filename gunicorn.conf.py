@@ -0,0 +1,21 @@
+# Конфигурация gunicorn для продакшена
+#
+# Приложение импортируется один раз в мастер-процессе (preload_app), воркеры
+# получают его через fork. Настройки, engine БД и клиенты создаются лениво,
+# поэтому до fork соединений с БД нет; post_fork дополнительно сбрасывает пул
+# на случай, если мастер успел им воспользоваться.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from app.core.database import dispose_engine
+    
+    dispose_engine(close=False)
+    server.log.info(f"Worker {worker.pid}: database pool reset after fork")
\ No newline at end of file
@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from app import create_app
+from app.api import create_app
 
 # Загрузка переменных окружения
 load_dotenv()
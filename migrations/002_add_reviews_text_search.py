@@ -0,0 +1,51 @@
+"""Add full-text search column to reviews
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add generated tsvector column with GIN index."""
+    op.add_column(
+        'reviews',
+        sa.Column(
+            'text_search',
+            TSVECTOR(),
+            sa.Computed("to_tsvector('russian'::regconfig, text)", persisted=True),
+            nullable=True
+        )
+    )
+    
+    # Индекс строится без блокировки записи в таблицу
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_reviews_text_search',
+            'reviews',
+            ['text_search'],
+            postgresql_using='gin',
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    """Drop full-text search column."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_reviews_text_search', 
+            table_name='reviews', 
+            postgresql_concurrently=True
+        )
+    op.drop_column('reviews', 'text_search')
\ No newline at end of file
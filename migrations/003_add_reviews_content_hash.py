@@ -0,0 +1,30 @@
+"""Add content hash to reviews
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add content_hash column and backfill it for existing reviews."""
+    op.add_column('reviews', sa.Column('content_hash', sa.String(32), nullable=True))
+    
+    # Та же формула, что и review_content_hash в приложении: иначе все
+    # существующие отзывы при следующем опросе ушли бы на повторную классификацию
+    op.execute("UPDATE reviews SET content_hash = md5(score::text || ':' || text)")
+
+
+def downgrade():
+    """Drop content_hash column."""
+    op.drop_column('reviews', 'content_hash')
\ No newline at end of file
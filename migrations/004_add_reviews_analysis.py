@@ -0,0 +1,39 @@
+"""Add versioned LLM analysis results to reviews
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add analysis JSONB column and fill it from existing categories."""
+    op.add_column(
+        'reviews',
+        sa.Column('analysis', JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb"))
+    )
+    
+    # Уже классифицированные отзывы не должны уходить в LLM повторно за категорией
+    op.execute("""
+        UPDATE reviews
+        SET analysis = jsonb_build_object(
+            'category', jsonb_build_object('value', review_category, 'version', 1)
+        )
+        WHERE review_category IS NOT NULL
+    """)
+
+
+def downgrade():
+    """Drop analysis column."""
+    op.drop_column('reviews', 'analysis')
\ No newline at end of file
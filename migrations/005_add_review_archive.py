@@ -0,0 +1,62 @@
+"""Add compressed archive for old review texts
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create review_archive table and is_archived flag."""
+    op.add_column(
+        'reviews',
+        sa.Column('is_archived', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+    
+    op.create_table(
+        'review_archive',
+        sa.Column(
+            'review_id', 
+            UUID(as_uuid=True), 
+            sa.ForeignKey('reviews.id', ondelete='CASCADE'), 
+            primary_key=True
+        ),
+        sa.Column('text_compressed', sa.LargeBinary(), nullable=False),
+        sa.Column('compression', sa.String(16), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    )
+    
+    # Архиватор ищет старые обработанные, еще не архивные отзывы
+    op.create_index(
+        'idx_reviews_archive_candidates',
+        'reviews',
+        ['date'],
+        postgresql_where=sa.text('is_processed AND NOT is_archived')
+    )
+
+
+def downgrade():
+    """Restore archived texts and drop review_archive table."""
+    # Тексты сжаты в приложении (zlib), SQL их не распакует
+    archived = op.get_bind().execute(
+        sa.text("SELECT count(*) FROM reviews WHERE is_archived")
+    ).scalar()
+    if archived:
+        raise RuntimeError(
+            f"{archived} reviews are archived, run 'python -m app.cli archive --restore' first"
+        )
+    
+    op.drop_index('idx_reviews_archive_candidates', table_name='reviews')
+    op.drop_table('review_archive')
+    op.drop_column('reviews', 'is_archived')
\ No newline at end of file
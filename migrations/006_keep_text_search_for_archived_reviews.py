@@ -0,0 +1,96 @@
+"""Keep full-text search vector for archived reviews
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    """Turn generated text_search into a trigger-maintained column."""
+    # Значения сохраняются, колонка становится обычной
+    op.execute("ALTER TABLE reviews ALTER COLUMN text_search DROP EXPRESSION")
+    
+    # Архивирование очищает text, но tsvector архивного отзыва остается прежним
+    op.execute("""
+        CREATE FUNCTION reviews_text_search_update() RETURNS trigger AS $$
+        BEGIN
+            IF NOT NEW.is_archived THEN
+                NEW.text_search := to_tsvector('russian'::regconfig, NEW.text);
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER reviews_text_search
+        BEFORE INSERT OR UPDATE OF text, is_archived ON reviews
+        FOR EACH ROW EXECUTE FUNCTION reviews_text_search_update()
+    """)
+    
+    # Отзывам, заархивированным до этой миграции, tsvector строится из архива
+    bind = op.get_bind()
+    last_id = None
+    while True:
+        rows = bind.execute(
+            sa.text("""
+                SELECT review_id, text_compressed FROM review_archive
+                WHERE compression = 'zlib' AND (CAST(:last_id AS uuid) IS NULL OR review_id > :last_id)
+                ORDER BY review_id
+                LIMIT :limit
+            """),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        
+        bind.execute(
+            sa.text("""
+                UPDATE reviews SET text_search = to_tsvector('russian'::regconfig, :text)
+                WHERE id = :id AND is_archived
+            """),
+            [
+                {"id": review_id, "text": zlib.decompress(bytes(data)).decode("utf-8")}
+                for review_id, data in rows
+            ]
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    """Restore generated text_search column (archived reviews drop out of search)."""
+    op.execute("DROP TRIGGER reviews_text_search ON reviews")
+    op.execute("DROP FUNCTION reviews_text_search_update()")
+    
+    op.drop_index('idx_reviews_text_search', table_name='reviews')
+    op.drop_column('reviews', 'text_search')
+    op.add_column(
+        'reviews',
+        sa.Column(
+            'text_search',
+            TSVECTOR(),
+            sa.Computed("to_tsvector('russian'::regconfig, text)", persisted=True),
+            nullable=True
+        )
+    )
+    op.create_index(
+        'idx_reviews_text_search',
+        'reviews',
+        ['text_search'],
+        postgresql_using='gin'
+    )
\ No newline at end of file
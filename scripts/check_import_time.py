@@ -0,0 +1,57 @@
+"""Проверка бюджета времени импорта приложения.
+
+Импорт не должен читать .env, создавать engine БД или клиентов: это
+замедляет старт каждого воркера. Скрипт импортирует модуль в отдельном
+процессе с -X importtime и падает, если суммарное время превышает бюджет.
+
+Пример:
+    python scripts/check_import_time.py --module main --budget-ms 800
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def measure(module: str):
+    """Вернуть список (накопленное время мкс, модуль) из вывода -X importtime."""
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise SystemExit(f"Failed to import {module}")
+    
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, name = [part.strip() for part in line.split("|")]
+        timings.append((int(cumulative_us), name))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check application import-time budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=800)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    
+    timings = measure(args.module)
+    total_ms = next(
+        (cumulative for cumulative, name in reversed(timings) if name == args.module), 0
+    ) / 1000
+    
+    print(f"Import of '{args.module}' took {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for cumulative, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name.strip()}")
+    
+    return 0 if total_ms <= args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
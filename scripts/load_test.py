@@ -0,0 +1,481 @@
+"""Нагрузочный сценарий для API сервиса отзывов.
+
+Поднимает фейковые RuStore, LLM и metrics API на локальных портах, запускает
+приложение (create_app) в этом же процессе на werkzeug и нагружает его заданным
+числом параллельных клиентов со смесью запросов. Результат - JSON с пропускной
+способностью, перцентилями задержек, долей ошибок и загрузкой пула соединений БД;
+его удобно сохранять и сравнивать между релизами.
+
+Нужна локальная Postgres с примененными миграциями (DATABASE_URL или --database-url).
+
+Пример:
+    python scripts/load_test.py --concurrency 16 --duration 60 \\
+        --mix get_reviews=1,health=5,search=2 --output load-test.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+
+LOAD_TEST_APP_TYPE = "Load Test"
+
+Route = Callable[[str, str, bytes], Tuple[int, Dict[str, Any]]]
+
+
+class FakeUpstream:
+    """HTTP сервер-заглушка апстрима с искусственной задержкой ответа."""
+    
+    def __init__(self, name: str, route: Route, latency: float):
+        self.name = name
+        self.route = route
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+    
+    def start(self) -> None:
+        threading.Thread(
+            target=self.server.serve_forever, name=f"fake-{self.name}", daemon=True
+        ).start()
+    
+    def stop(self) -> None:
+        self.server.shutdown()
+    
+    def _handler_class(self):
+        upstream = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                self._handle("GET")
+            
+            def do_POST(self):
+                self._handle("POST")
+            
+            def _handle(self, method: str) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with upstream._lock:
+                    upstream.requests += 1
+                
+                if upstream.latency:
+                    time.sleep(random.uniform(0.5, 1.5) * upstream.latency)
+                
+                status, payload = upstream.route(method, self.path, body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+
+def rustore_route(reviews_per_app: int, edit_rate: float) -> Route:
+    """Фейковый RuStore: токен и детерминированный набор отзывов на приложение."""
+    texts = [
+        "Приложение вылетает при входе, ошибка после обновления",
+        "Не проходит оплата картой, зависает на подтверждении",
+        "Отличное приложение, всем доволен",
+        "Удобный интерфейс, спасибо разработчикам",
+        "После обновления не приходят уведомления",
+        "Нормально, но хотелось бы темную тему",
+    ]
+    base_date = datetime(2024, 1, 1)
+    
+    def route(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path.startswith("/auth/token"):
+            return 200, {"access_token": "load-test-token"}
+        
+        if not path.startswith("/api/v1/reviews/"):
+            return 404, {"error": "not found"}
+        
+        package_name = path.rsplit("/", 1)[-1]
+        reviews = []
+        for index in range(reviews_per_app):
+            edited = random.random() < edit_rate
+            date = (base_date + timedelta(minutes=index)).isoformat()
+            text = texts[(index + len(package_name)) % len(texts)]
+            reviews.append({
+                "id": f"{package_name}-{index}",
+                "published_date": date,
+                "written_date": date,
+                "rating": 1 + (index % 5),
+                "text": f"{text} #{index}" + (" (изменено)" if edited else ""),
+                "app_version": f"1.{index % 10}.0",
+                "likes_count": index % 7,
+                "dislikes_count": index % 3,
+                "is_modified": edited,
+                "device_manufacturer": "LoadTest",
+                "device_model": f"Model {index % 4}"
+            })
+        return 200, {"reviews": reviews}
+    
+    return route
+
+
+def llm_route(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+    """Фейковый LLM API: по результату на каждый отзыв и тип анализа."""
+    payload = json.loads(body or b"{}")
+    analysis_types = payload.get("analysis_types", ["category"])
+    results = []
+    for text in payload.get("reviews", []):
+        result = {analysis_type: "neutral" for analysis_type in analysis_types}
+        if "category" in result:
+            is_bug = any(word in text for word in ("ошибка", "вылетает", "зависает", "не "))
+            result["category"] = "bug" if is_bug else "other"
+        results.append(result)
+    return 200, {"results": results}
+
+
+def metrics_route(method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+    return 200, {"status": "ok"}
+
+
+class PoolSampler:
+    """Периодически снимает число занятых соединений пула БД."""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pool-sampler", daemon=True)
+    
+    def start(self) -> None:
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        from app.core.database import get_engine
+        
+        pool = get_engine().pool
+        while not self._stopped.wait(self.interval):
+            self.samples.append(pool.checkedout())
+    
+    def report(self) -> Dict[str, Any]:
+        from app.core.config import settings
+        
+        capacity = settings.db_pool_size + settings.db_max_overflow
+        samples = self.samples or [0]
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "max_checked_out": max(samples),
+            "mean_checked_out": round(sum(samples) / len(samples), 2),
+            "p95_checked_out": percentile(sorted(samples), 0.95),
+            "saturation": round(max(samples) / capacity, 3) if capacity else None,
+            # Доля замеров, когда все соединения заняты и новые запросы ждут пула
+            "exhausted_ratio": round(
+                sum(1 for sample in samples if sample >= capacity) / len(samples), 3
+            )
+        }
+
+
+def percentile(sorted_values: List[float], quantile: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(quantile * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """'get_reviews=1,health=5' -> {'get_reviews': 1, 'health': 5}."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown request type '{name}', expected one of {sorted(SCENARIOS)}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def _get_reviews(session: requests.Session, base_url: str, args: argparse.Namespace):
+    apps = [
+        {"app_type": LOAD_TEST_APP_TYPE, "package_name": f"com.loadtest.app{index}"}
+        for index in random.sample(range(args.apps), min(args.apps, args.apps_per_request))
+    ]
+    return session.post(
+        f"{base_url}/api/v1/get_reviews",
+        json={"stores": [{"type": "rustore", "apps": apps}]},
+        timeout=args.timeout
+    )
+
+
+def _health(session: requests.Session, base_url: str, args: argparse.Namespace):
+    return session.get(f"{base_url}/api/v1/health", timeout=args.timeout)
+
+
+def _search(session: requests.Session, base_url: str, args: argparse.Namespace):
+    query = random.choice(["ошибка", "оплата", "уведомления", "\"темную тему\""])
+    return session.get(
+        f"{base_url}/api/v1/reviews/search",
+        params={"q": query, "app_type": LOAD_TEST_APP_TYPE, "limit": 20},
+        timeout=args.timeout
+    )
+
+
+def _export(session: requests.Session, base_url: str, args: argparse.Namespace):
+    response = session.get(
+        f"{base_url}/api/v1/reviews/export",
+        params={"format": "ndjson", "app_type": LOAD_TEST_APP_TYPE},
+        timeout=args.timeout,
+        stream=True
+    )
+    for _ in response.iter_content(chunk_size=65536):
+        pass
+    return response
+
+
+SCENARIOS = {
+    "get_reviews": _get_reviews,
+    "health": _health,
+    "search": _search,
+    "export": _export,
+}
+
+
+class LoadGenerator:
+    """Параллельные клиенты, выбирающие тип запроса по весам смеси."""
+    
+    def __init__(self, base_url: str, args: argparse.Namespace):
+        self.base_url = base_url
+        self.args = args
+        self.mix = parse_mix(args.mix)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.error_samples: Dict[str, str] = {}
+        self._issued = 0
+        self._lock = threading.Lock()
+    
+    def run(self) -> float:
+        """Прогнать нагрузку; вернуть фактическую длительность в секундах."""
+        deadline = time.monotonic() + self.args.duration if self.args.duration else None
+        workers = [
+            threading.Thread(target=self._worker, args=(deadline,), name=f"load-{index}")
+            for index in range(self.args.concurrency)
+        ]
+        
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.monotonic() - started
+    
+    def _next_request(self, deadline: Optional[float]) -> Optional[str]:
+        with self._lock:
+            if self.args.requests and self._issued >= self.args.requests:
+                return None
+            if deadline and time.monotonic() >= deadline:
+                return None
+            self._issued += 1
+        
+        names = list(self.mix)
+        return random.choices(names, weights=[self.mix[name] for name in names])[0]
+    
+    def _worker(self, deadline: Optional[float]) -> None:
+        session = requests.Session()
+        
+        while True:
+            name = self._next_request(deadline)
+            if name is None:
+                return
+            
+            started = time.perf_counter()
+            error = None
+            try:
+                response = SCENARIOS[name](session, self.base_url, self.args)
+                if response.status_code >= 400:
+                    error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.RequestException as e:
+                error = f"{e.__class__.__name__}: {e}"
+            elapsed = time.perf_counter() - started
+            
+            with self._lock:
+                self.latencies[name].append(elapsed)
+                if error:
+                    self.errors[name] += 1
+                    self.error_samples.setdefault(name, error)
+    
+    def report(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name, latencies in sorted(self.latencies.items()):
+            values = sorted(latencies)
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(values), 4),
+                "throughput_rps": round(len(values) / duration, 2),
+                "latency_ms": {
+                    "mean": round(sum(values) / len(values) * 1000, 2),
+                    "p50": round(percentile(values, 0.50) * 1000, 2),
+                    "p95": round(percentile(values, 0.95) * 1000, 2),
+                    "p99": round(percentile(values, 0.99) * 1000, 2),
+                    "max": round(values[-1] * 1000, 2),
+                },
+            }
+            if name in self.error_samples:
+                endpoints[name]["error_sample"] = self.error_samples[name]
+        
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        total_errors = sum(self.errors.values())
+        all_latencies = sorted(
+            latency for latencies in self.latencies.values() for latency in latencies
+        )
+        return {
+            "requests": total,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / duration, 2),
+            "latency_ms": {
+                "p50": round(percentile(all_latencies, 0.50) * 1000, 2),
+                "p95": round(percentile(all_latencies, 0.95) * 1000, 2),
+                "p99": round(percentile(all_latencies, 0.99) * 1000, 2),
+            },
+            "endpoints": endpoints,
+        }
+
+
+def configure_environment(args: argparse.Namespace, upstreams: Dict[str, FakeUpstream]) -> None:
+    """Направить приложение на фейковые апстримы; вызывается до импорта app."""
+    os.environ.update({
+        "RUSTORE_API_URL": upstreams["rustore"].url,
+        "LLM_API_URL": upstreams["llm"].url,
+        "METRICS_API_URL": upstreams["metrics"].url,
+        "RUSTORE_CLIENT_ID": "load-test",
+        "RUSTORE_CLIENT_SECRET": "load-test",
+        "LLM_API_KEY": "load-test",
+        "PIPELINE_MODE": args.pipeline_mode,
+    })
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if args.db_pool_size is not None:
+        os.environ["DB_POOL_SIZE"] = str(args.db_pool_size)
+    if args.db_max_overflow is not None:
+        os.environ["DB_MAX_OVERFLOW"] = str(args.db_max_overflow)
+
+
+def reset_load_test_reviews() -> int:
+    """Удалить отзывы, созданные предыдущими прогонами."""
+    from sqlalchemy import delete
+    
+    from app.core.database import get_db_session
+    from app.models.database import Review
+    
+    with get_db_session() as session:
+        return session.execute(
+            delete(Review).where(Review.app_type == LOAD_TEST_APP_TYPE)
+        ).rowcount
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the review service API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных клиентов")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность, секунд")
+    parser.add_argument("--requests", type=int, default=0, help="Остановиться после N запросов")
+    parser.add_argument("--mix", default="get_reviews=1,health=4,search=2",
+                        help="Веса типов запросов: get_reviews, health, search, export")
+    parser.add_argument("--apps", type=int, default=20, help="Приложений в фейковом сторе")
+    parser.add_argument("--apps-per-request", type=int, default=3)
+    parser.add_argument("--reviews-per-app", type=int, default=200)
+    parser.add_argument("--edit-rate", type=float, default=0.02,
+                        help="Доля отзывов, меняющих текст между опросами")
+    parser.add_argument("--store-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--metrics-latency", type=float, default=0.005)
+    parser.add_argument("--pipeline-mode", choices=["sync", "async", "staged"], default="sync")
+    parser.add_argument("--database-url", help="По умолчанию DATABASE_URL из окружения/.env")
+    parser.add_argument("--db-pool-size", type=int)
+    parser.add_argument("--db-max-overflow", type=int)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--reset", action="store_true", help="Удалить отзывы прошлых прогонов")
+    parser.add_argument("--output", help="Файл для JSON отчета (по умолчанию stdout)")
+    args = parser.parse_args()
+    
+    upstreams = {
+        "rustore": FakeUpstream(
+            "rustore", rustore_route(args.reviews_per_app, args.edit_rate), args.store_latency
+        ),
+        "llm": FakeUpstream("llm", llm_route, args.llm_latency),
+        "metrics": FakeUpstream("metrics", metrics_route, args.metrics_latency),
+    }
+    for upstream in upstreams.values():
+        upstream.start()
+    
+    configure_environment(args, upstreams)
+    
+    from dotenv import load_dotenv
+    from werkzeug.serving import make_server
+    
+    load_dotenv()
+    from app.api import create_app
+    
+    if args.reset:
+        print(f"Deleted {reset_load_test_reviews()} reviews from previous runs", file=sys.stderr)
+    
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    
+    sampler = PoolSampler(interval=0.05)
+    sampler.start()
+    generator = LoadGenerator(base_url, args)
+    started_at = datetime.utcnow()
+    
+    try:
+        duration = generator.run()
+    finally:
+        sampler.stop()
+        server.shutdown()
+        for upstream in upstreams.values():
+            upstream.stop()
+    
+    report = {
+        "started_at": started_at.isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "database_url")
+        },
+        "duration_s": round(duration, 2),
+        **generator.report(duration),
+        "db_pool": sampler.report(),
+        "upstream_requests": {name: upstream.requests for name, upstream in upstreams.items()},
+    }
+    
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            report_file.write(output + "\n")
+    print(output)
+    
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Обучение локального предклассификатора на отзывах, размеченных LLM.
+
+Пример:
+    python scripts/train_preclassifier.py --output models/preclassifier.json --limit 200000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from app.core.config import settings
+from app.core.logger import setup_logger
+from app.services.preclassifier import train_from_database
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train review pre-classifier from LLM labels")
+    parser.add_argument(
+        "--output",
+        default=settings.preclassifier_model_path or "models/preclassifier.json",
+        help="Путь для сохранения модели"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Максимум отзывов для обучения")
+    args = parser.parse_args()
+    
+    logger = setup_logger('review_service')
+    model = train_from_database(limit=args.limit)
+    model.save(args.output)
+    logger.info(f"Pre-classifier model saved to {args.output}")
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    main()